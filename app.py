@@ -1,14 +1,13 @@
 import os
 import logging
 
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+from database import configure_database, init_engine
 
 class Base(DeclarativeBase):
     pass
@@ -20,32 +19,150 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
-# Configure the database - using local SQLite
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///attendance.db"
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+# Root log level; DEBUG on every request is itself a cost, so it is opt-in
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO').upper()
 
 # Configure upload settings
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# Initialize the app with the extension
-db.init_app(app)
-migrate = Migrate(app, db)
+# Search near each kiosk's previous face box before scanning the whole frame
+app.config['FACE_TRACKING'] = os.environ.get('FACE_TRACKING', '1') == '1'
+# Default reduced-resolution decode (1, 2, 4 or 8) for binary kiosk frames
+app.config['FRAME_DECODE_SCALE'] = int(os.environ.get('FRAME_DECODE_SCALE', '1'))
+# Upper bound on frames accepted by one /api/recognize_batch call
+app.config['BATCH_MAX_FRAMES'] = int(os.environ.get('BATCH_MAX_FRAMES', '16'))
+# Attendance write-behind: commit once this many events queue up or the interval (seconds) elapses
+app.config['ATTENDANCE_BATCH_SIZE'] = int(os.environ.get('ATTENDANCE_BATCH_SIZE', '100'))
+app.config['ATTENDANCE_FLUSH_INTERVAL'] = float(os.environ.get('ATTENDANCE_FLUSH_INTERVAL', '0.5'))
+# Failed batches are retried with doubling delays, then kept in the spill file until the database is back
+app.config['ATTENDANCE_FLUSH_RETRIES'] = int(os.environ.get('ATTENDANCE_FLUSH_RETRIES', '5'))
+app.config['ATTENDANCE_RETRY_DELAY'] = float(os.environ.get('ATTENDANCE_RETRY_DELAY', '0.5'))
+app.config['ATTENDANCE_SPILL_PATH'] = os.environ.get('ATTENDANCE_SPILL_PATH', os.path.join(app.instance_path, 'attendance_spill.jsonl'))
+# Face matching backend: 'exact' brute force, or 'ivf' for galleries in the tens of thousands
+app.config['FACE_MATCHER'] = os.environ.get('FACE_MATCHER', 'exact')
+app.config['FACE_MATCHER_NLIST'] = int(os.environ['FACE_MATCHER_NLIST']) if os.environ.get('FACE_MATCHER_NLIST') else None
+app.config['FACE_MATCHER_NPROBE'] = int(os.environ.get('FACE_MATCHER_NPROBE', '16'))
+# Kiosk frames that hash within KIOSK_DEDUP_DISTANCE bits of the previous one reuse its response
+app.config['KIOSK_DEDUP'] = os.environ.get('KIOSK_DEDUP', '1') == '1'
+app.config['KIOSK_DEDUP_DISTANCE'] = int(os.environ.get('KIOSK_DEDUP_DISTANCE', '4'))
+app.config['KIOSK_RECOGNITION_TTL'] = float(os.environ.get('KIOSK_RECOGNITION_TTL', '30'))
+# Kiosk browser gating: frames are checked locally every KIOSK_CHECK_INTERVAL_MS and uploaded as face crops
+app.config['KIOSK_CROP_SIZE'] = int(os.environ.get('KIOSK_CROP_SIZE', '320'))
+app.config['KIOSK_JPEG_QUALITY'] = float(os.environ.get('KIOSK_JPEG_QUALITY', '0.7'))
+app.config['KIOSK_CHECK_INTERVAL_MS'] = int(os.environ.get('KIOSK_CHECK_INTERVAL_MS', '250'))
+# Kiosk WebSocket channel at /ws/kiosk, used when flask-sock is installed and the server can hand
+# over sockets (not waitress, so run.py turns it off); at most KIOSK_STREAM_MAX streams are open at once
+app.config['KIOSK_STREAM'] = os.environ.get('KIOSK_STREAM', '1') == '1'
+app.config['KIOSK_STREAM_MAX'] = int(os.environ.get('KIOSK_STREAM_MAX', '32'))
+# Frames waiting per kiosk WebSocket; older ones are dropped so recognition always sees the newest
+app.config['KIOSK_STREAM_QUEUE'] = int(os.environ.get('KIOSK_STREAM_QUEUE', '1'))
+# Recognition runs on its own thread pool; beyond RECOGNITION_QUEUE waiting jobs kiosks get 429 + Retry-After
+app.config['RECOGNITION_WORKERS'] = int(os.environ.get('RECOGNITION_WORKERS', str(os.cpu_count() or 2)))
+app.config['RECOGNITION_QUEUE'] = int(os.environ.get('RECOGNITION_QUEUE', str(app.config['RECOGNITION_WORKERS'] * 4)))
+app.config['RECOGNITION_TIMEOUT'] = float(os.environ.get('RECOGNITION_TIMEOUT', '10'))
+# Prometheus-style /metrics (protected by METRICS_TOKEN when set); PROFILE_SAMPLE_RATE=N profiles 1 in N recognitions
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN') or None
+app.config['PROFILE_SAMPLE_RATE'] = int(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+# Warm the gallery and presence set at startup (in the master when gunicorn runs with --preload)
+app.config['PRELOAD'] = os.environ.get('PRELOAD', '0') == '1'
+# Registration photos are resized and JPEG-encoded by this many background threads
+app.config['PHOTO_WRITE_WORKERS'] = int(os.environ.get('PHOTO_WRITE_WORKERS', '2'))
+app.config['PHOTO_WRITE_QUEUE'] = int(os.environ.get('PHOTO_WRITE_QUEUE', '32'))
+# Photos are stored as full/card/thumb sizes, each also as WebP when Pillow supports it
+app.config['PHOTO_WEBP'] = os.environ.get('PHOTO_WEBP', '1') == '1'
+# Content-versioned static URLs and hashed photo names are cached by browsers for this long
+app.config['STATIC_CACHE'] = os.environ.get('STATIC_CACHE', '1') == '1'
+app.config['STATIC_MAX_AGE'] = int(os.environ.get('STATIC_MAX_AGE', str(365 * 24 * 3600)))
+# Printed on every ID card; changing them re-renders the cached cards
+app.config['ID_CARD_SCHOOL_NAME'] = os.environ.get('ID_CARD_SCHOOL_NAME', 'Kendriya Vidyalaya')
+app.config['ID_CARD_SCHOOL_ADDRESS'] = os.environ.get('ID_CARD_SCHOOL_ADDRESS', 'Sector 1, City, State, ZIP')
+app.config['ID_CARD_VALIDITY'] = os.environ.get('ID_CARD_VALIDITY', 'Valid for Academic Year 2024-2025')
+# Rendered cards and print sheets hold personal data, so they are kept out of static/
+app.config['ID_CARD_CACHE_DIR'] = os.environ.get('ID_CARD_CACHE_DIR', os.path.join(app.instance_path, 'id_cards'))
+app.config['ID_CARD_WORKERS'] = int(os.environ['ID_CARD_WORKERS']) if os.environ.get('ID_CARD_WORKERS') else None
+# Bulk import uploads may be this large (that route only); job work directories live in BULK_IMPORT_DIR,
+# which every worker process must share so any of them can report a job's progress
+app.config['BULK_IMPORT_MAX_UPLOAD'] = int(os.environ.get('BULK_IMPORT_MAX_UPLOAD', str(2 * 1024 ** 3)))
+app.config['BULK_IMPORT_DIR'] = os.environ.get('BULK_IMPORT_DIR', os.path.join(app.instance_path, 'imports'))
 
-# Create uploads directory if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs('static/face_encodings', exist_ok=True)
+def create_app(config=None):
+    """Finish assembling the application and return it.
 
-with app.app_context():
-    # Import models to ensure tables are created
-    import models
-    db.create_all()
-    
-    # Import routes after app context is established
-    import routes
+    Every module registers on the shared ``app`` object (``from app import
+    app``), so this wires extensions, routes and CLI commands onto it once;
+    later calls return it unchanged. Nothing here touches the database or
+    the filesystem: schema creation and the default admin are ``flask
+    init-db``, and warming caches for forked workers is ``preload``.
+    """
+    if 'sqlalchemy' in app.extensions:
+        return app
+    if config:
+        app.config.update(config)
+
+    logging.basicConfig(level=app.config['LOG_LEVEL'])
+
+    # Configure the database - local SQLite by default, DATABASE_URL for anything else
+    configure_database(app)
+    db.init_app(app)
+    # Alembic is only needed by `flask db ...`; web workers skip importing it
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db, render_as_batch=True)
+
+    # Request timing hooks must be registered before the first request
+    from metrics import metrics
+    metrics.init_app(app)
+
+    with app.app_context():
+        init_engine(app, db)
+        import models
+
+        # Today's presence set (loaded on first use) and the background writer for recognized attendance events
+        from presence import presence
+        from attendance_writer import attendance_writer
+        presence.init_app(app)
+        attendance_writer.init_app(app)
+        from image_pipeline import photo_writer
+        photo_writer.init_app(app)
+        from static_cache import static_cache
+        static_cache.init_app(app)
+        from kiosk_sessions import kiosk_sessions
+        kiosk_sessions.init_app(app)
+        from recognition_pool import recognition_pool
+        recognition_pool.init_app(app)
+
+        import routes
+        import commands
+
+        # Optional WebSocket channel for kiosks (needs flask-sock and a threaded server)
+        if app.config['KIOSK_STREAM']:
+            from kiosk_stream import init_stream
+            init_stream(app)
+    return app
+
+def preload(app):
+    """Warm the face gallery and today's presence set ahead of the first request.
+
+    Run it in the gunicorn master (``--preload``) and the forked workers
+    share the mapped embeddings, the matcher index and the imported OpenCV
+    and NumPy code copy-on-write instead of each building their own.
+    """
+    with app.app_context():
+        import utils  # OpenCV, NumPy, PIL and the recognition helpers
+        from face_gallery import gallery
+        from presence import presence
+        gallery.load()
+        presence.warm()
+        # Pooled connections must not be inherited by forked workers
+        db.engine.dispose()
+    return app
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    create_app()
+    from commands import init_database
+    with app.app_context():
+        init_database()
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,280 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import AttendanceRecord, Student
+from presence import presence
+from summaries import summary_deltas, apply_summary_deltas
+from metrics import metrics
+
+_STOP = object()
+# Spilled events are retried at most this often
+SPILL_REPLAY_SECONDS = 60
+
+FLUSH_SECONDS = metrics.histogram('attendance_flush_duration_seconds', 'Time to commit one batch of attendance events')
+FLUSH_EVENTS = metrics.counter('attendance_events_flushed_total', 'Attendance events taken off the write-behind queue')
+FLUSH_FAILURES = metrics.counter('attendance_flush_failures_total', 'Failed attempts to commit a batch of attendance events')
+SPILLED_EVENTS = metrics.counter('attendance_events_spilled_total', 'Attendance events saved to the spill file after every retry failed')
+
+class AttendanceWriter:
+    """Write-behind queue for attendance events.
+
+    Recognition requests call ``submit`` and return immediately; a background
+    thread groups queued events and commits them in one transaction once
+    ``ATTENDANCE_BATCH_SIZE`` events are waiting or ``ATTENDANCE_FLUSH_INTERVAL``
+    seconds have passed. Repeat sightings of a student on the same day are
+    dropped by the ``presence`` registry before they ever reach the queue.
+
+    Kiosks are told "Attendance marked" before the commit, so a batch is never
+    dropped: a failed commit is retried ``ATTENDANCE_FLUSH_RETRIES`` times with
+    doubling delays, then appended to ``ATTENDANCE_SPILL_PATH`` (JSON lines)
+    and replayed once the database accepts writes again. Replays are safe to
+    repeat because (student, date) is unique. Events for students deleted in
+    the meantime are dropped.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.batch_size = 100
+        self.flush_interval = 0.5
+        self.retries = 5
+        self.retry_delay = 0.5
+        self.spill_path = None
+        self._next_replay = 0.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.setdefault('ATTENDANCE_BATCH_SIZE', 100)
+        self.flush_interval = app.config.setdefault('ATTENDANCE_FLUSH_INTERVAL', 0.5)
+        self.retries = app.config.setdefault('ATTENDANCE_FLUSH_RETRIES', 5)
+        self.retry_delay = app.config.setdefault('ATTENDANCE_RETRY_DELAY', 0.5)
+        self.spill_path = app.config.setdefault('ATTENDANCE_SPILL_PATH', os.path.join(app.instance_path, 'attendance_spill.jsonl'))
+        app.extensions['attendance_writer'] = self
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so each worker process starts its own
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+                    self._thread.start()
+
+    def submit(self, student_id, confidence=None, timestamp=None):
+        """Queue an attendance mark; returns False if the student was already queued today"""
+        timestamp = timestamp or datetime.now()
+        if not presence.mark(student_id, timestamp.date()):
+            return False
+        self._ensure_started()
+        self._queue.put({'student_id': student_id, 'confidence': confidence, 'timestamp': timestamp})
+        return True
+
+    def backlog(self):
+        """Events queued but not yet committed"""
+        return self._queue.qsize()
+
+    def _run(self):
+        self._reclaim_replays()
+        while True:
+            event = self._queue.get()
+            if event is _STOP:
+                self._queue.task_done()
+                return
+            batch = [event]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stop = True
+                    break
+                batch.append(event)
+            with FLUSH_SECONDS.time():
+                written = self._write(batch, self.retries)
+            FLUSH_EVENTS.inc(len(batch))
+            if written:
+                self._replay_spill()
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch, retries):
+        """Commit ``batch``, retrying with backoff; spills it and returns False when every attempt fails"""
+        delay = self.retry_delay
+        for attempt in range(retries + 1):
+            try:
+                self._flush(batch)
+                return True
+            except Exception as e:
+                FLUSH_FAILURES.inc()
+                self.app.logger.error(f"Failed to write {len(batch)} attendance record(s) (attempt {attempt + 1} of {retries + 1}): {str(e)}")
+                if attempt < retries:
+                    time.sleep(delay)
+                    delay = min(delay * 2, 30)
+        self._spill(batch)
+        return False
+
+    def _flush(self, batch):
+        with self.app.app_context():
+            try:
+                student_ids = {event['student_id'] for event in batch}
+                dates = {event['timestamp'].date() for event in batch}
+                # Students deleted while their events were queued or spilled
+                live_ids = {sid for (sid,) in db.session.query(Student.id).filter(Student.id.in_(student_ids))}
+                existing = set(
+                    db.session.query(AttendanceRecord.student_id, AttendanceRecord.date).filter(
+                        AttendanceRecord.student_id.in_(student_ids), AttendanceRecord.date.in_(dates)
+                    )
+                )
+                records = []
+                for event in batch:
+                    key = (event['student_id'], event['timestamp'].date())
+                    if key in existing or event['student_id'] not in live_ids:
+                        continue
+                    existing.add(key)
+                    records.append(AttendanceRecord(
+                        student_id=event['student_id'],
+                        timestamp=event['timestamp'],
+                        date=key[1],
+                        confidence=event['confidence']
+                    ))
+                if records:
+                    deltas = summary_deltas(records)
+                    try:
+                        db.session.add_all(records)
+                        apply_summary_deltas(deltas)
+                        db.session.commit()
+                    except IntegrityError:
+                        # Another worker marked some of these first; keep the rest
+                        db.session.rollback()
+                        self._insert_individually(records)
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _spill(self, batch):
+        """Append events that could not be committed to the spill file"""
+        try:
+            os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+            with open(self.spill_path, 'a') as f:
+                for event in batch:
+                    f.write(json.dumps(dict(event, timestamp=event['timestamp'].isoformat())) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            # Nowhere left to keep them: let the students be marked again
+            self.app.logger.error(f"Lost {len(batch)} attendance record(s), spill file unwritable: {str(e)}")
+            for event in batch:
+                presence.discard(event['student_id'], event['timestamp'].date())
+            return
+        SPILLED_EVENTS.inc(len(batch))
+        self.app.logger.error(f"Saved {len(batch)} attendance record(s) to {self.spill_path} for a later retry")
+
+    def _replay_spill(self):
+        """Retry spilled events once the database is writable again"""
+        if time.monotonic() < self._next_replay or not os.path.exists(self.spill_path):
+            return
+        self._next_replay = time.monotonic() + SPILL_REPLAY_SECONDS
+        # Claim the file so other worker processes neither replay it too nor append to it
+        claimed = f"{self.spill_path}.{os.getpid()}.replay"
+        try:
+            os.replace(self.spill_path, claimed)
+        except FileNotFoundError:
+            return
+        try:
+            self._replay_file(claimed)
+        except Exception as e:
+            # Left claimed; the next writer thread to start picks it up again
+            self.app.logger.error(f"Could not replay {claimed}: {str(e)}")
+
+    def _replay_file(self, path):
+        events = []
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    event = json.loads(line)
+                    events.append(dict(event, timestamp=datetime.fromisoformat(event['timestamp'])))
+        for start in range(0, len(events), self.batch_size):
+            # One attempt each: failures go straight back to the spill file
+            self._write(events[start:start + self.batch_size], retries=0)
+        os.remove(path)
+        self.app.logger.info(f"Replayed {len(events)} spilled attendance record(s)")
+
+    def _reclaim_replays(self):
+        """Finish replays left behind by processes that died mid-replay"""
+        for path in glob.glob(f"{glob.escape(self.spill_path)}.*.replay"):
+            pid = int(path.rsplit('.', 2)[1])
+            if pid != os.getpid():
+                try:
+                    os.kill(pid, 0)
+                    continue  # still running, its replay is in progress
+                except ProcessLookupError:
+                    pass
+                except PermissionError:
+                    continue
+            try:
+                self._replay_file(path)
+            except Exception as e:
+                self.app.logger.error(f"Could not replay {path}: {str(e)}")
+
+    def _insert_individually(self, records):
+        inserted = []
+        for record in records:
+            retry = AttendanceRecord(
+                student_id=record.student_id,
+                timestamp=record.timestamp,
+                date=record.date,
+                confidence=record.confidence
+            )
+            try:
+                with db.session.begin_nested():
+                    db.session.add(retry)
+                inserted.append(retry)
+            except IntegrityError:
+                pass
+        apply_summary_deltas(summary_deltas(inserted))
+        db.session.commit()
+
+    def flush(self):
+        """Block until every queued event has been written"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def shutdown(self, timeout=10):
+        """Drain the queue and stop the worker thread; whatever is still queued after ``timeout`` is spilled"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                pending = []
+                while True:
+                    try:
+                        event = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if event is not _STOP:
+                        pending.append(event)
+                if pending:
+                    self._spill(pending)
+
+attendance_writer = AttendanceWriter()
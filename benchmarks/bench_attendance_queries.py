@@ -0,0 +1,132 @@
+"""
+Benchmark the hot attendance queries with and without the schema indexes.
+
+Builds a throwaway SQLite database holding a year of attendance for a
+synthetic school, times the queries issued by the dashboard, attendance
+register, statistics page and kiosk API, then drops the indexes and times
+them again.
+
+    python benchmarks/bench_attendance_queries.py --students 5000 --days 365
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, func, insert, select, text
+
+from app import db
+from models import Student, AttendanceRecord
+
+INDEXES = [
+    'uq_attendance_student_date',
+    'ix_attendance_record_date_timestamp',
+    'ix_attendance_record_timestamp',
+    'ix_student_class_name',
+    'ix_student_is_active',
+]
+
+def build_database(engine, students, days, attendance_rate, seed):
+    rng = random.Random(seed)
+    db.metadata.create_all(engine)
+    today = date.today()
+    with engine.begin() as conn:
+        conn.execute(insert(Student), [
+            {
+                'id': i,
+                'student_id': f'S{i:06d}',
+                'first_name': f'First{i}',
+                'last_name': f'Last{i}',
+                'class_name': str(1 + i % 12),
+                'section': 'ABCD'[i % 4],
+                'is_active': rng.random() > 0.05,
+            }
+            for i in range(1, students + 1)
+        ])
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        rows = []
+        for student_id in range(1, students + 1):
+            if rng.random() < attendance_rate:
+                ts = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randint(7 * 3600, 9 * 3600))
+                rows.append({'student_id': student_id, 'date': day, 'timestamp': ts, 'status': 'present', 'confidence': 0.9})
+        with engine.begin() as conn:
+            conn.execute(insert(AttendanceRecord), rows)
+
+def hot_queries(students):
+    today = date.today()
+    week_ago = today - timedelta(days=6)
+    probe = students // 2
+    return {
+        'dashboard_today_count': select(func.count(AttendanceRecord.id)).where(AttendanceRecord.date == today),
+        'dashboard_active_count': select(func.count(Student.id)).where(Student.is_active.is_(True)),
+        'dashboard_recent': select(AttendanceRecord).order_by(AttendanceRecord.timestamp.desc()).limit(10),
+        'register_day': select(AttendanceRecord).where(AttendanceRecord.date == today).order_by(AttendanceRecord.timestamp.desc()),
+        'statistics_daily': select(AttendanceRecord.date, func.count(AttendanceRecord.id)).where(AttendanceRecord.date >= week_ago).group_by(AttendanceRecord.date),
+        'statistics_classes': select(Student.class_name, func.count(Student.id)).group_by(Student.class_name),
+        'kiosk_already_marked': select(AttendanceRecord.id).where(AttendanceRecord.student_id == probe, AttendanceRecord.date == today).limit(1),
+    }
+
+def time_queries(engine, queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, query in queries.items():
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(query).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+            results[name] = {'median_ms': round(statistics.median(samples), 3), 'max_ms': round(max(samples), 3)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--attendance-rate', type=float, default=0.9)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        start = time.perf_counter()
+        build_database(engine, args.students, args.days, args.attendance_rate, args.seed)
+        with engine.connect() as conn:
+            rows = conn.execute(select(func.count(AttendanceRecord.id))).scalar()
+        build_seconds = time.perf_counter() - start
+
+        queries = hot_queries(args.students)
+        indexed = time_queries(engine, queries, args.repeat)
+        with engine.begin() as conn:
+            for name in INDEXES:
+                conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        unindexed = time_queries(engine, queries, args.repeat)
+
+    report = {
+        'students': args.students,
+        'days': args.days,
+        'attendance_rows': rows,
+        'build_seconds': round(build_seconds, 1),
+        'indexed': indexed,
+        'unindexed': unindexed,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{rows} attendance rows for {args.students} students over {args.days} days (built in {build_seconds:.1f}s)")
+    print(f"{'query':<26}{'indexed ms':>12}{'unindexed ms':>14}{'speedup':>10}")
+    for name in queries:
+        fast, slow = indexed[name]['median_ms'], unindexed[name]['median_ms']
+        print(f"{name:<26}{fast:>12.3f}{slow:>14.3f}{slow / fast if fast else 0:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
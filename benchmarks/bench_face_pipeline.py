@@ -0,0 +1,120 @@
+"""
+Microbenchmark the face helpers against a synthetic school.
+
+Builds a school (see ``synthetic_school.py``) in a temporary directory, then
+times ``recognize_face``, ``save_face_encoding_from_data``,
+``search_student_by_image``, ``optimize_image`` and ``write_derivatives``
+(every stored photo size) one call at a time on
+fresh jittered probes. ``--json`` output carries the revision and library
+versions so results from two checkouts can be compared directly.
+
+    python benchmarks/bench_face_pipeline.py --face-image face.jpg --students 1000 --days 30 --json > before.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+
+from synthetic_school import (build_school, data_url, encode_jpeg, environment, face_variant, latency_summary,
+                              load_app, load_faces)
+
+def time_calls(fn, inputs):
+    """Call ``fn`` once per input; returns latencies in ms and how many calls reported success"""
+    latencies, successes = [], 0
+    for item in inputs:
+        start = time.perf_counter()
+        result = fn(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+        successes += bool(result is None or (isinstance(result, dict) and result.get('success')))
+    return latencies, successes
+
+def run_benchmarks(faces, repeat, seed, workdir):
+    from models import Student
+    from utils import recognize_face, save_face_encoding_from_data, search_student_by_image, optimize_image
+    from image_pipeline import photo_digest, write_derivatives
+
+    rng = np.random.default_rng(seed + 100)
+    probes = [face_variant(faces[i % len(faces)], rng, strength=0.5) for i in range(repeat)]
+    urls = [data_url(encode_jpeg(probe)) for probe in probes]
+    student_ids = [sid for (sid,) in Student.query.with_entities(Student.id).order_by(Student.id).limit(repeat)]
+    if not student_ids:
+        raise SystemExit('No students were enrolled; check that --face-image contains one detectable face')
+
+    results = {}
+    # Warm up the cascade and gallery outside the timed loops
+    recognize_face(probes[0])
+
+    latencies, ok = time_calls(recognize_face, probes)
+    results['recognize_face'] = dict(latency_summary(latencies), successes=ok)
+
+    latencies, ok = time_calls(lambda url: search_student_by_image(url), urls)
+    results['search_student_by_image'] = dict(latency_summary(latencies), successes=ok)
+
+    pairs = [(url, student_ids[i % len(student_ids)]) for i, url in enumerate(urls)]
+    latencies, ok = time_calls(lambda pair: save_face_encoding_from_data(*pair), pairs)
+    results['save_face_encoding_from_data'] = dict(latency_summary(latencies), successes=ok)
+
+    # optimize_image rewrites in place, so each call gets its own full-size copy
+    scratch = os.path.join(workdir, 'optimize')
+    os.makedirs(scratch, exist_ok=True)
+    paths = []
+    for i, probe in enumerate(probes):
+        large = cv2.resize(probe, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+        path = os.path.join(scratch, f'{i}.jpg')
+        with open(path, 'wb') as f:
+            f.write(encode_jpeg(large, quality=95))
+        paths.append(path)
+    latencies, ok = time_calls(optimize_image, paths)
+    results['optimize_image'] = dict(latency_summary(latencies), successes=ok)
+
+    jobs = [(cv2.resize(probe, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC), os.path.join(scratch, f'derived_{i}_{photo_digest(probe)}.jpg'))
+            for i, probe in enumerate(probes)]
+    latencies, ok = time_calls(lambda job: write_derivatives(*job), jobs)
+    results['write_derivatives'] = dict(latency_summary(latencies), successes=ok)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--face-image', nargs='+', required=True, help='Frontal face photo(s) the students are generated from')
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--attendance-rate', type=float, default=0.9)
+    parser.add_argument('--repeat', type=int, default=50, help='Timed calls per helper')
+    parser.add_argument('--workers', type=int, default=None, help='Enrollment processes while building the school')
+    parser.add_argument('--workdir', default=None, help='Keep the synthetic school here instead of a temporary directory')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    faces = load_faces([os.path.abspath(p) for p in args.face_image])
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='bench-school-'))
+    try:
+        app = load_app(workdir)
+        with app.app_context():
+            school = build_school(workdir, args.students, args.days, faces, args.attendance_rate, args.workers, args.seed)
+            results = run_benchmarks(faces, args.repeat, args.seed, workdir)
+    finally:
+        if args.workdir is None:
+            os.chdir(tempfile.gettempdir())
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'environment': environment(), 'school': school, 'repeat': args.repeat, 'results': results}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{school['enrolled']}/{args.students} students enrolled, {school['attendance_rows']} attendance rows "
+          f"(built in {school['build_seconds']:.1f}s)")
+    print(f"{'helper':<32}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'ok':>6}")
+    for name, r in results.items():
+        print(f"{name:<32}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['mean_ms']:>10.2f}{r['successes']:>6}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare the approximate face matchers against exact search.
+
+Generates a synthetic gallery shaped like the real embeddings (unit vectors
+clustered around look-alike groups), probes it with noisy copies of enrolled
+rows, and reports recall@1 against the exact matcher together with p50/p99
+single-probe latency. Incremental enrollment and deletion are timed through
+the same ``sync`` path the gallery uses.
+
+    python benchmarks/bench_matchers.py --rows 100000 --nprobe 4,8,16,32
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from face_embedding import EMBEDDING_DIM
+from matchers import TOMBSTONE, ExactMatcher, IVFMatcher
+
+def normalize(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def synthetic_gallery(rows, dim, clusters, spread, seed):
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.standard_normal((clusters, dim)))
+    labels = rng.integers(0, clusters, rows)
+    vectors = normalize(centres[labels] + spread * rng.standard_normal((rows, dim)) / np.sqrt(dim))
+    return np.arange(1, rows + 1, dtype=np.int64), vectors
+
+def noisy_probes(vectors, queries, noise, seed):
+    rng = np.random.default_rng(seed + 1)
+    rows = rng.choice(len(vectors), queries, replace=False)
+    probes = normalize(vectors[rows] + noise * rng.standard_normal((queries, vectors.shape[1])) / np.sqrt(vectors.shape[1]))
+    return probes
+
+def run_queries(matcher, probes, top_k):
+    latencies, top1 = [], []
+    for probe in probes:
+        start = time.perf_counter()
+        student_ids, _ = matcher.search(probe[None, :], top_k)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        top1.append(student_ids[0] if len(student_ids) else -1)
+    return np.array(top1), np.array(latencies)
+
+def summarize(name, top1, latencies, truth, build_seconds, extra=None):
+    report = {
+        'matcher': name,
+        'recall_at_1': round(float((top1 == truth).mean()), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'build_seconds': round(build_seconds, 2),
+    }
+    report.update(extra or {})
+    return report
+
+def time_incremental(matcher, ids, vectors, batch):
+    """Append ``batch`` rows then tombstone them again, as registration and delete_student do"""
+    rng = np.random.default_rng(7)
+    new_ids = np.arange(ids[-1] + 1, ids[-1] + 1 + batch, dtype=np.int64)
+    new_vectors = normalize(rng.standard_normal((batch, vectors.shape[1])))
+    grown_ids = np.concatenate([ids, new_ids])
+    grown_vectors = np.concatenate([vectors, new_vectors])
+    start = time.perf_counter()
+    matcher.sync(grown_ids, grown_vectors)
+    add_ms = (time.perf_counter() - start) * 1000
+    shrunk_ids = grown_ids.copy()
+    shrunk_ids[-batch:] = TOMBSTONE
+    start = time.perf_counter()
+    matcher.sync(shrunk_ids, grown_vectors)
+    remove_ms = (time.perf_counter() - start) * 1000
+    return {'add_ms': round(add_ms, 2), 'remove_ms': round(remove_ms, 2), 'incremental_rows': batch}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--clusters', type=int, default=2000, help='Look-alike groups in the synthetic gallery')
+    parser.add_argument('--spread', type=float, default=3.0, help='Within-group noise')
+    parser.add_argument('--noise', type=float, default=1.0, help='Probe noise relative to the enrolled row')
+    parser.add_argument('--nlist', type=int, default=None, help='IVF buckets (default: 4*sqrt(rows))')
+    parser.add_argument('--nprobe', default='4,8,16,32', help='Comma-separated IVF nprobe values to sweep')
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--incremental', type=int, default=100, help='Rows added and removed in the incremental test')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    ids, vectors = synthetic_gallery(args.rows, EMBEDDING_DIM, args.clusters, args.spread, args.seed)
+    probes = noisy_probes(vectors, args.queries, args.noise, args.seed)
+
+    results = []
+    start = time.perf_counter()
+    exact = ExactMatcher()
+    exact.sync(ids, vectors)
+    build = time.perf_counter() - start
+    truth, latencies = run_queries(exact, probes, args.top_k)
+    results.append(summarize('exact', truth, latencies, truth, build, time_incremental(exact, ids, vectors, args.incremental)))
+
+    for nprobe in [int(n) for n in args.nprobe.split(',') if n]:
+        start = time.perf_counter()
+        ivf = IVFMatcher(nlist=args.nlist, nprobe=nprobe)
+        ivf.sync(ids, vectors)
+        build = time.perf_counter() - start
+        top1, latencies = run_queries(ivf, probes, args.top_k)
+        extra = {'nlist': ivf.describe()['nlist'], 'nprobe': nprobe}
+        extra.update(time_incremental(ivf, ids, vectors, args.incremental))
+        results.append(summarize('ivf', top1, latencies, truth, build, extra))
+
+    report = {'rows': args.rows, 'dim': EMBEDDING_DIM, 'queries': args.queries, 'results': results}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.rows} synthetic embeddings (dim {EMBEDDING_DIM}), {args.queries} probes")
+    print(f"{'matcher':<16}{'recall@1':>10}{'p50 ms':>10}{'p99 ms':>10}{'build s':>10}{'add ms':>10}{'remove ms':>11}")
+    for r in results:
+        label = r['matcher'] if r['matcher'] == 'exact' else f"ivf/{r['nlist']}/{r['nprobe']}"
+        print(f"{label:<16}{r['recall_at_1']:>10.3f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['build_seconds']:>10.2f}{r['add_ms']:>10.2f}{r['remove_ms']:>11.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Measure application cold start.
+
+Each run is a fresh interpreter in a throwaway working directory, timing
+the phases a web worker goes through: importing ``app``, ``create_app()``,
+the first request, and optionally ``preload()`` (gallery and presence
+warm-up). The wall time of a no-op CLI command is measured too, since every
+``flask ...`` invocation pays the same start-up. ``--embeddings`` fills the
+embedding store with random vectors so the gallery warm-up has realistic
+work to do.
+
+    python benchmarks/bench_startup.py --runs 10 --embeddings 20000 --matcher ivf --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SETUP = """
+import numpy as np
+from embedding_store import EmbeddingStore
+from face_embedding import EMBEDDING_DIM
+count = {embeddings}
+if count:
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    EmbeddingStore('static/face_encodings', EMBEDDING_DIM).append_many(np.arange(1, count + 1), vectors)
+"""
+
+WORKER = """
+import json, resource, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+application = app_module.create_app()
+created = time.perf_counter()
+application.test_client().get('/login')
+first_request = time.perf_counter()
+if {preload}:
+    app_module.preload(application)
+preloaded = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - created) * 1000,
+    'preload_ms': (preloaded - first_request) * 1000,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+def run_python(code, workdir, env):
+    result = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    return result.stdout
+
+def summarize(samples):
+    return {'median': round(statistics.median(samples), 1), 'max': round(max(samples), 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--embeddings', type=int, default=0, help='Random embeddings to enroll before measuring')
+    parser.add_argument('--matcher', default='exact', help='FACE_MATCHER for the run')
+    parser.add_argument('--no-preload', action='store_true', help='Skip timing preload()')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-startup-') as workdir:
+        env = dict(os.environ, PYTHONPATH=ROOT, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                   FACE_MATCHER=args.matcher, LOG_LEVEL='WARNING', FLASK_APP='main')
+        subprocess.run([sys.executable, '-m', 'flask', 'init-db'], cwd=workdir, env=env, check=True, capture_output=True)
+        run_python(SETUP.format(embeddings=args.embeddings), workdir, env)
+
+        phases, walls, cli = {}, [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            sample = json.loads(run_python(WORKER.format(preload=not args.no_preload), workdir, env).strip().splitlines()[-1])
+            walls.append((time.perf_counter() - start) * 1000)
+            for name, value in sample.items():
+                phases.setdefault(name, []).append(value)
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-m', 'flask', 'init-db'], cwd=workdir, env=env, check=True, capture_output=True)
+            cli.append((time.perf_counter() - start) * 1000)
+
+    report = {
+        'runs': args.runs,
+        'embeddings': args.embeddings,
+        'matcher': args.matcher,
+        'phases': {name: summarize(values) for name, values in phases.items()},
+        'worker_wall_ms': summarize(walls),
+        'cli_wall_ms': summarize(cli),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.runs} cold starts, {args.embeddings} embeddings, {args.matcher} matcher")
+    print(f"{'phase':<20}{'median':>10}{'max':>10}")
+    for name, values in list(report['phases'].items()) + [('worker wall ms', report['worker_wall_ms']), ('cli wall ms', report['cli_wall_ms'])]:
+        print(f"{name:<20}{values['median']:>10.1f}{values['max']:>10.1f}")
+
+if __name__ == '__main__':
+    main()
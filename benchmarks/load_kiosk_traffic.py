@@ -0,0 +1,272 @@
+"""
+Multi-client load test replaying kiosk and admin traffic over HTTP.
+
+Kiosk clients post jittered face frames to ``/api/recognize_face`` as fast
+as the server answers (or paced by ``next_capture_ms`` with
+``--honor-pacing``), each with its own ``X-Kiosk-Id``; admin clients log in
+and cycle through the dashboard, register, statistics and student pages.
+Throughput and p50/p95/p99 latency are reported per endpoint.
+
+Without ``--url`` a synthetic school is built in a temporary directory and
+served from a separate process (werkzeug, threaded), so the load generator
+does not share the server's GIL. With ``--url`` any running deployment is
+targeted instead; its students will not match the generated faces, so
+recognitions come back as unrecognized. ``--baseline`` compares against an
+earlier ``--json`` run.
+
+    python benchmarks/load_kiosk_traffic.py --face-image face.jpg --kiosks 8 --admins 2 --seconds 30 --json > after.json
+    python benchmarks/load_kiosk_traffic.py --face-image face.jpg --baseline before.json
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from synthetic_school import data_url, encode_jpeg, environment, face_variant, latency_summary, load_faces
+
+ADMIN_PAGES = ['/dashboard', '/attendance_register', '/statistics', '/manage_students', '/api/students/search?q=First1']
+
+def serve(workdir, faces, students, days, workers, seed, ready):
+    """Server process: build the school, then serve it until terminated"""
+    from synthetic_school import build_school, load_app
+    from werkzeug.serving import make_server
+
+    app = load_app(workdir)
+    with app.app_context():
+        school = build_school(workdir, students, days, faces, workers=workers, seed=seed)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no access log line per request
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    ready.put((server.server_port, school))
+    server.serve_forever()
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.statuses = {}
+        self.outcomes = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, ms, status, outcome=None):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(ms)
+            counts = self.statuses.setdefault(endpoint, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+            if outcome:
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+def request(opener, url, data=None, headers=None):
+    """Returns ``(status, body)``; HTTP errors are results here, not exceptions"""
+    req = urllib.request.Request(url, data=data, headers=headers or {})
+    try:
+        with opener.open(req, timeout=60) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        return 'error', b''
+
+def kiosk_outcome(body):
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return 'bad_response', None
+    if data.get('duplicate'):
+        return 'duplicate', data
+    if data.get('retry_after'):
+        return 'overloaded', data
+    if data.get('success'):
+        return ('already_marked' if data.get('already_marked') else 'marked'), data
+    return 'unrecognized', data
+
+def kiosk_client(base_url, frames, kiosk_id, stop_at, recorder, honor_pacing, think_ms):
+    opener = urllib.request.build_opener()
+    url = base_url + '/api/recognize_face'
+    headers = {'Content-Type': 'application/json', 'X-Kiosk-Id': kiosk_id}
+    i = 0
+    while time.perf_counter() < stop_at:
+        body = frames[i % len(frames)]
+        i += 1
+        start = time.perf_counter()
+        status, payload = request(opener, url, body, headers)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        outcome, data = kiosk_outcome(payload) if status != 'error' else ('error', None)
+        recorder.add('/api/recognize_face', elapsed_ms, status, outcome)
+        pause = think_ms / 1000
+        if outcome == 'overloaded':
+            # Real kiosks always back off on 429; retrying at once would only measure rejections
+            pause = max(pause, data['retry_after'])
+        elif honor_pacing and data and data.get('next_capture_ms'):
+            pause = max(pause, data['next_capture_ms'] / 1000)
+        if pause:
+            time.sleep(pause)
+
+def admin_client(base_url, username, password, stop_at, recorder, think_ms, offset):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    form = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+    start = time.perf_counter()
+    status, _ = request(opener, base_url + '/login', form, {'Content-Type': 'application/x-www-form-urlencoded'})
+    recorder.add('/login', (time.perf_counter() - start) * 1000, status)
+    i = offset
+    while time.perf_counter() < stop_at:
+        page = ADMIN_PAGES[i % len(ADMIN_PAGES)]
+        i += 1
+        start = time.perf_counter()
+        status, _ = request(opener, base_url + page)
+        recorder.add(page.split('?')[0], (time.perf_counter() - start) * 1000, status)
+        if think_ms:
+            time.sleep(think_ms / 1000)
+
+def kiosk_frames(faces, count, seed):
+    """Pre-encoded JSON request bodies: mostly jittered faces, plus some empty scenes"""
+    rng = np.random.default_rng(seed + 200)
+    bodies = []
+    for i in range(count):
+        if i % 10 == 9:
+            frame = np.full_like(faces[0], 128)  # nobody in front of the camera
+        else:
+            frame = face_variant(faces[i % len(faces)], rng, strength=0.5)
+        bodies.append(json.dumps({'image': data_url(encode_jpeg(frame, quality=70))}).encode())
+    return bodies
+
+def run_load(base_url, frames, args):
+    recorder = Recorder()
+    warmup_until = time.perf_counter() + args.warmup
+    # Warm-up traffic is sent but not recorded
+    warm = Recorder()
+    threads = [threading.Thread(target=kiosk_client, args=(base_url, frames, f'bench-warmup-{k}', warmup_until, warm, False, 0))
+               for k in range(min(args.kiosks, 2))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    start = time.perf_counter()
+    stop_at = start + args.seconds
+    threads = [threading.Thread(target=kiosk_client, args=(base_url, frames[k::args.kiosks] or frames, f'bench-kiosk-{k}',
+                                                           stop_at, recorder, args.honor_pacing, args.kiosk_think_ms))
+               for k in range(args.kiosks)]
+    threads += [threading.Thread(target=admin_client, args=(base_url, args.admin_user, args.admin_password, stop_at,
+                                                            recorder, args.admin_think_ms, a))
+                for a in range(args.admins)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        statuses = recorder.statuses[endpoint]
+        errors = sum(count for status, count in statuses.items() if status == 'error' or int(status) >= 500)
+        endpoints[endpoint] = dict(latency_summary(samples), throughput_rps=round(len(samples) / elapsed, 2),
+                                   errors=errors, statuses=statuses)
+    total = sum(len(s) for s in recorder.samples.values())
+    return {'elapsed_seconds': round(elapsed, 2), 'requests': total, 'throughput_rps': round(total / elapsed, 2),
+            'kiosk_outcomes': recorder.outcomes, 'endpoints': endpoints}
+
+def compare(report, baseline):
+    """Per-endpoint change against an earlier run: positive latency deltas are regressions"""
+    changes = {}
+    for endpoint, now in report['results']['endpoints'].items():
+        before = baseline.get('results', {}).get('endpoints', {}).get(endpoint)
+        if not before:
+            continue
+        changes[endpoint] = {
+            f'{key}_change_pct': round((now[key] - before[key]) / before[key] * 100, 1) if before[key] else None
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')
+        }
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--face-image', nargs='+', required=True, help='Frontal face photo(s) for students and kiosk frames')
+    parser.add_argument('--url', default=None, help='Target a running server instead of a synthetic one')
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=None, help='Enrollment processes while building the school')
+    parser.add_argument('--kiosks', type=int, default=8, help='Concurrent kiosk clients')
+    parser.add_argument('--admins', type=int, default=2, help='Concurrent admin clients')
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3, help='Unrecorded warm-up before measuring')
+    parser.add_argument('--frames', type=int, default=64, help='Distinct kiosk frames to replay')
+    parser.add_argument('--kiosk-think-ms', type=float, default=0)
+    parser.add_argument('--admin-think-ms', type=float, default=500)
+    parser.add_argument('--honor-pacing', action='store_true', help="Wait for the server's next_capture_ms like the kiosk page does")
+    parser.add_argument('--admin-user', default='admin')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--baseline', default=None, help='Earlier --json output to compare against')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    faces = load_faces([os.path.abspath(p) for p in args.face_image])
+    frames = kiosk_frames(faces, args.frames, args.seed)
+    server, workdir, school = None, None, None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            workdir = tempfile.mkdtemp(prefix='load-school-')
+            ready = multiprocessing.Queue()
+            # Not a daemon: enrollment inside it starts its own process pool
+            server = multiprocessing.Process(target=serve, args=(workdir, faces, args.students, args.days, args.workers, args.seed, ready))
+            server.start()
+            while True:
+                try:
+                    port, school = ready.get(timeout=1)
+                    break
+                except queue.Empty:
+                    if not server.is_alive():
+                        raise SystemExit('Server process exited while building the school')
+            base_url = f'http://127.0.0.1:{port}'
+        results = run_load(base_url, frames, args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'environment': environment(),
+        'target': args.url or 'synthetic',
+        'school': school,
+        'params': {'kiosks': args.kiosks, 'admins': args.admins, 'seconds': args.seconds, 'frames': args.frames,
+                   'kiosk_think_ms': args.kiosk_think_ms, 'admin_think_ms': args.admin_think_ms,
+                   'honor_pacing': args.honor_pacing},
+        'results': results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'] = compare(report, json.load(f))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{results['requests']} requests in {results['elapsed_seconds']}s ({results['throughput_rps']} req/s) "
+          f"from {args.kiosks} kiosk and {args.admins} admin clients")
+    print(f"kiosk outcomes: {results['kiosk_outcomes']}")
+    print(f"{'endpoint':<28}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for endpoint, r in results['endpoints'].items():
+        print(f"{endpoint:<28}{r['throughput_rps']:>9.2f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}")
+    if report.get('comparison'):
+        print('change against baseline:')
+    for endpoint, change in report.get('comparison', {}).items():
+        print(f"{endpoint:<28}" + '  '.join(f"{key.replace('_change_pct', '')} {value:+.1f}%" for key, value in change.items() if value is not None))
+
+if __name__ == '__main__':
+    main()
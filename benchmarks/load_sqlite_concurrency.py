@@ -0,0 +1,127 @@
+"""
+Concurrency load test for the SQLite tuning in ``database.py``.
+
+Runs kiosk-style writer threads (one small insert + commit each) alongside
+dashboard-style reader threads against a fresh database, first with
+SQLite's defaults and then with the tuned pragmas, and reports throughput
+and read latency for each. With the defaults every commit takes an
+exclusive lock that stalls readers; in WAL mode the two proceed in parallel.
+
+    python benchmarks/load_sqlite_concurrency.py --writers 4 --readers 4 --seconds 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, func, insert, select
+
+from database import DEFAULT_SQLITE_PRAGMAS, engine_options, install_sqlite_pragmas
+from app import db
+from models import Student, AttendanceRecord
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(tuned, writers, readers, seconds, students):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        if tuned:
+            engine = create_engine(url, **engine_options(url, pool_size=writers + readers))
+            install_sqlite_pragmas(engine, DEFAULT_SQLITE_PRAGMAS)
+        else:
+            engine = create_engine(url, pool_size=writers + readers, connect_args={'check_same_thread': False})
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Student), [
+                {'id': i, 'student_id': f'S{i}', 'first_name': 'F', 'last_name': 'L', 'class_name': '1', 'section': 'A'}
+                for i in range(1, students + 1)
+            ])
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        read_latencies, write_latencies = [], []
+        errors = {'read': 0, 'write': 0}
+        next_student = iter(range(1, 10 ** 9))
+        today = date.today()
+
+        def writer():
+            while not stop.is_set():
+                with lock:
+                    student_id = next(next_student) % students + 1
+                start = time.perf_counter()
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(insert(AttendanceRecord).prefix_with('OR IGNORE'), {
+                            'student_id': student_id, 'date': today, 'timestamp': datetime.now(), 'confidence': 0.9,
+                        })
+                except Exception:
+                    errors['write'] += 1
+                    continue
+                with lock:
+                    write_latencies.append(time.perf_counter() - start)
+
+        def reader():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(select(func.count(AttendanceRecord.id)).where(AttendanceRecord.date == today)).scalar()
+                        conn.execute(select(AttendanceRecord).order_by(AttendanceRecord.timestamp.desc()).limit(10)).fetchall()
+                except Exception:
+                    errors['read'] += 1
+                    continue
+                with lock:
+                    read_latencies.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        threads += [threading.Thread(target=reader) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    return {
+        'mode': 'tuned' if tuned else 'default',
+        'writes_per_s': round(len(write_latencies) / seconds, 1),
+        'reads_per_s': round(len(read_latencies) / seconds, 1),
+        'write_p50_ms': round(statistics.median(write_latencies) * 1000, 2) if write_latencies else None,
+        'write_p99_ms': round(percentile(write_latencies, 99) * 1000, 2),
+        'read_p50_ms': round(statistics.median(read_latencies) * 1000, 2) if read_latencies else None,
+        'read_p99_ms': round(percentile(read_latencies, 99) * 1000, 2),
+        'errors': dict(errors),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    results = [run(tuned, args.writers, args.readers, args.seconds, args.students) for tuned in (False, True)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    columns = ['mode', 'writes_per_s', 'reads_per_s', 'write_p50_ms', 'write_p99_ms', 'read_p50_ms', 'read_p99_ms', 'errors']
+    print('  '.join(f'{c:>13}' for c in columns))
+    for result in results:
+        print('  '.join(f'{str(result[c]):>13}' for c in columns))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Synthetic school shared by the face pipeline benchmark and the kiosk load test.
+
+Students are generated from one or more real frontal face photos: every
+student gets a randomly jittered copy (rotation, scale, shift, exposure,
+mirroring, sensor noise) that is enrolled through the same bulk import path
+as a real roster, followed by ``days`` of attendance history. Everything
+lives in a throwaway directory so the real database and photo folders are
+never touched.
+
+    python benchmarks/synthetic_school.py --face-image face.jpg --students 500 --days 60 --workdir /tmp/school
+"""
+import argparse
+import base64
+import contextlib
+import csv
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+
+def load_faces(paths):
+    faces = []
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise SystemExit(f"Could not read face image {path}")
+        faces.append(image)
+    return faces
+
+def face_variant(image, rng, strength=1.0):
+    """A jittered copy of ``image``; ``rng`` is a ``numpy.random.Generator``"""
+    height, width = image.shape[:2]
+    angle = rng.uniform(-8, 8) * strength
+    scale = 1 + rng.uniform(-0.08, 0.08) * strength
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, scale)
+    matrix[:, 2] += rng.uniform(-0.04, 0.04, 2) * (width, height) * strength
+    out = cv2.warpAffine(image, matrix, (width, height), borderMode=cv2.BORDER_REFLECT)
+    out = cv2.convertScaleAbs(out, alpha=1 + rng.uniform(-0.2, 0.2) * strength, beta=rng.uniform(-20, 20) * strength)
+    if rng.random() < 0.5:
+        out = cv2.flip(out, 1)
+    noise = rng.normal(0, 3 * strength, out.shape)
+    return np.clip(out + noise, 0, 255).astype(np.uint8)
+
+def encode_jpeg(image, quality=85):
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError('JPEG encoding failed')
+    return buffer.tobytes()
+
+def data_url(jpeg):
+    return 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+
+def student_row(i):
+    return {
+        'student_id': f'S{i:06d}',
+        'first_name': f'First{i}',
+        'last_name': f'Last{i}',
+        'class_name': str(1 + i % 12),
+        'section': 'ABCD'[i % 4],
+    }
+
+def write_roster(workdir, students, faces, seed):
+    """Write ``roster.csv`` and one generated photo per student; returns ``(roster, photo_dir)``"""
+    rng = np.random.default_rng(seed)
+    photo_dir = os.path.join(workdir, 'roster_photos')
+    os.makedirs(photo_dir, exist_ok=True)
+    roster = os.path.join(workdir, 'roster.csv')
+    with open(roster, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(student_row(1)))
+        writer.writeheader()
+        for i in range(1, students + 1):
+            row = student_row(i)
+            writer.writerow(row)
+            photo = face_variant(faces[i % len(faces)], rng)
+            with open(os.path.join(photo_dir, f"{row['student_id']}.jpg"), 'wb') as out:
+                out.write(encode_jpeg(photo))
+    return roster, photo_dir
+
+def load_app(workdir):
+    """Import the app against a database and file tree under ``workdir``.
+
+    Must run before anything else imports ``app``: the database URL is read
+    at import time and uploads, photos and embeddings are relative paths.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(os.path.abspath(workdir), 'school.db')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.chdir(workdir)
+    from app import create_app
+    app = create_app()
+    # Keep the default admin notice out of --json output
+    with app.app_context(), contextlib.redirect_stdout(sys.stderr):
+        from commands import init_database
+        init_database()
+    return app
+
+def seed_history(days, attendance_rate, seed):
+    """Insert ``days`` of past attendance (today is left free for kiosks) and rebuild the rollups"""
+    from sqlalchemy import insert
+    from app import db
+    from models import Student, AttendanceRecord
+    from summaries import rebuild_summaries
+
+    rng = random.Random(seed)
+    student_ids = [sid for (sid,) in db.session.query(Student.id)]
+    today = date.today()
+    rows_written = 0
+    for offset in range(1, days + 1):
+        day = today - timedelta(days=offset)
+        rows = []
+        for student_id in student_ids:
+            if rng.random() < attendance_rate:
+                ts = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randint(7 * 3600, 9 * 3600))
+                rows.append({'student_id': student_id, 'date': day, 'timestamp': ts, 'status': 'present', 'confidence': 0.9})
+        if rows:
+            db.session.execute(insert(AttendanceRecord), rows)
+            rows_written += len(rows)
+    db.session.commit()
+    rebuild_summaries()
+    return rows_written
+
+def build_school(workdir, students, days, faces, attendance_rate=0.9, workers=None, seed=1):
+    """Enroll ``students`` generated students and their history; needs an app context"""
+    from enrollment import ImportReport, import_roster
+
+    start = time.perf_counter()
+    roster, photo_dir = write_roster(workdir, students, faces, seed)
+    report = import_roster(roster, photo_dir, report=ImportReport(), workers=workers)
+    enrolled_seconds = time.perf_counter() - start
+    history = seed_history(days, attendance_rate, seed)
+    return {
+        'students': students,
+        'enrolled': report.counts['enrolled'],
+        'enroll_errors': report.counts['error'],
+        'days': days,
+        'attendance_rows': history,
+        'enroll_seconds': round(enrolled_seconds, 2),
+        'build_seconds': round(time.perf_counter() - start, 2),
+    }
+
+def environment():
+    """Versions and revision recorded with every result so runs can be compared"""
+    import platform
+    import subprocess
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        'revision': revision,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'cpus': os.cpu_count(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def latency_summary(samples_ms):
+    return {
+        'count': len(samples_ms),
+        'mean_ms': round(sum(samples_ms) / len(samples_ms), 3) if samples_ms else 0.0,
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'max_ms': round(max(samples_ms), 3) if samples_ms else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--face-image', nargs='+', required=True, help='Frontal face photo(s) the students are generated from')
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--attendance-rate', type=float, default=0.9)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--workdir', required=True, help='Directory for the database, photos and embeddings')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    faces = load_faces([os.path.abspath(p) for p in args.face_image])
+    app = load_app(args.workdir)
+    with app.app_context():
+        summary = build_school('.', args.students, args.days, faces, args.attendance_rate, args.workers, args.seed)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
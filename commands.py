@@ -0,0 +1,165 @@
+import os
+import pickle
+import sys
+from datetime import date
+import click
+import cv2
+from app import app, db
+from models import Admin, Student, AttendanceRecord, DailyAttendanceSummary
+from face_gallery import gallery, compute_face_embedding
+from summaries import rebuild_summaries
+from export import attendance_rows, iter_csv, iter_parquet
+from enrollment import ImportReport, import_roster
+
+DEFAULT_ADMIN_USERNAME = 'admin'
+DEFAULT_ADMIN_PASSWORD = 'admin123'
+
+def init_database():
+    """Create missing tables, the search index, the attendance rollup and the default admin; needs an app context"""
+    from student_search import ensure_search_index
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(gallery.store.directory, exist_ok=True)
+    db.create_all()
+    ensure_search_index()
+    # Databases created before the rollup table existed have history but no summaries
+    if not db.session.query(DailyAttendanceSummary.id).first() and db.session.query(AttendanceRecord.id).first():
+        rows = rebuild_summaries()
+        click.echo(f"Built {rows} daily summary row(s) from existing attendance")
+    if not Admin.query.first():
+        create_admin(DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD)
+        click.echo(f"Default admin created: username='{DEFAULT_ADMIN_USERNAME}', password='{DEFAULT_ADMIN_PASSWORD}'")
+
+def create_admin(username, password):
+    admin = Admin.query.filter_by(username=username).first() or Admin(username=username)
+    admin.set_password(password)
+    db.session.add(admin)
+    db.session.commit()
+    return admin
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the schema and seed the default admin; safe to re-run"""
+    init_database()
+    click.echo("Database ready")
+
+@app.cli.command('create-admin')
+@click.argument('username')
+@click.password_option()
+def create_admin_command(username, password):
+    """Create an admin account, or reset the password of an existing one"""
+    create_admin(username, password)
+    click.echo(f"Admin '{username}' saved")
+
+@app.cli.command('migrate-encodings')
+@click.option('--keep-pickles', is_flag=True, help='Leave the legacy .pkl files in place.')
+def migrate_encodings(keep_pickles):
+    """Import legacy encoding_<id>.pkl files into the embedding store"""
+    encoding_dir = gallery.store.directory
+    migrated, skipped = 0, 0
+    for filename in sorted(os.listdir(encoding_dir)):
+        if not (filename.startswith('encoding_') and filename.endswith('.pkl')):
+            continue
+        pkl_path = os.path.join(encoding_dir, filename)
+        try:
+            student_id = int(filename.split('_')[1].split('.')[0])
+            with open(pkl_path, 'rb') as f:
+                face_data = pickle.load(f)
+            embedding = face_data.get('embedding')
+            if embedding is None:
+                # Older encodings only stored the face box; rebuild from the saved photo
+                student = db.session.get(Student, student_id)
+                photo = os.path.join('static', student.photo_path) if student and student.photo_path else None
+                image = cv2.imread(photo) if photo else None
+                if image is not None:
+                    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                    embedding = compute_face_embedding(gray, face_data['face_region'])
+            if embedding is None:
+                click.echo(f"Skipping {filename}: no embedding and no usable photo")
+                skipped += 1
+                continue
+            gallery.store.append(student_id, embedding)
+            student = db.session.get(Student, student_id)
+            if student:
+                student.face_encoding_path = gallery.store.vectors_path
+            if not keep_pickles:
+                os.remove(pkl_path)
+            migrated += 1
+        except Exception as e:
+            click.echo(f"Skipping {filename}: {str(e)}")
+            skipped += 1
+    db.session.commit()
+    click.echo(f"Migrated {migrated} encoding(s), skipped {skipped}")
+
+@app.cli.command('compact-embeddings')
+def compact_embeddings():
+    """Rewrite the embedding store without deleted rows"""
+    gallery.store.compact()
+    click.echo(f"Embedding store compacted: {len(gallery)} live embedding(s)")
+
+@app.cli.command('rebuild-summaries')
+def rebuild_summaries_command():
+    """Recompute the daily attendance rollup from the attendance table"""
+    rows = rebuild_summaries()
+    click.echo(f"Rebuilt {rows} daily summary row(s)")
+
+@app.cli.command('export-attendance')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First day (default: --end).')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day (default: today).')
+@click.option('--class-name', default=None, help='Only this class.')
+@click.option('--section', default=None, help='Only this section.')
+@click.option('--format', 'export_format', type=click.Choice(['csv', 'parquet']), default='csv')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), help='Output file (default: stdout).')
+def export_attendance_command(start, end, class_name, section, export_format, output):
+    """Stream attendance records for a date range to CSV or Parquet"""
+    end_date = end.date() if end else date.today()
+    start_date = start.date() if start else end_date
+    rows = attendance_rows(start_date, end_date, class_name=class_name, section=section)
+    if export_format == 'parquet':
+        if not output:
+            raise click.UsageError('Parquet export needs --output')
+        with open(output, 'wb') as f:
+            for chunk in iter_parquet(rows):
+                f.write(chunk)
+        return
+    handle = open(output, 'w', newline='') if output else sys.stdout
+    try:
+        for chunk in iter_csv(rows):
+            handle.write(chunk)
+    finally:
+        if output:
+            handle.close()
+
+@app.cli.command('import-students')
+@click.argument('roster', type=click.Path(exists=True, dir_okay=False))
+@click.argument('photo_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--workers', type=int, default=None, help='Photo processing processes (default: CPU count).')
+@click.option('--batch-size', type=int, default=200, show_default=True, help='Students inserted per transaction.')
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False, writable=True), default='import_report.csv',
+              show_default=True, help='Per-row result CSV; appended to when resuming.')
+def import_students_command(roster, photo_dir, workers, batch_size, report_path):
+    """Enroll students from a roster CSV and a folder of photos; safe to re-run"""
+    report = ImportReport(report_path, append=True)
+    try:
+        import_roster(roster, photo_dir, report=report, workers=workers, batch_size=batch_size,
+                      progress=lambda done, total: click.echo(f"Processed {done}/{total} photo(s)"))
+    finally:
+        report.close()
+    counts = report.counts
+    click.echo(f"Enrolled {counts['enrolled']}, skipped {counts['skipped']}, failed {counts['error']}; report: {report_path}")
+
+@app.cli.command('id-cards')
+@click.option('--class-name', default=None, help='Only this class.')
+@click.option('--section', default=None, help='Only this section.')
+@click.option('--format', 'sheet_format', type=click.Choice(['pdf', 'png']), default='pdf')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), required=True, help='Print sheet file.')
+@click.option('--workers', type=int, default=None, help='Rendering processes (default: CPU count).')
+def id_cards_command(class_name, section, sheet_format, output, workers):
+    """Render ID cards for active students into a print sheet; unchanged cards come from the cache"""
+    import shutil
+    from utils import id_card_sheet
+    sheet = id_card_sheet(class_name or '', section or '', sheet_format, workers=workers)
+    if sheet is None:
+        raise click.ClickException('No active students match')
+    sheet_path, _, cards, rendered = sheet
+    shutil.copyfile(sheet_path, output)
+    click.echo(f"{cards} card(s), {rendered} rendered, {cards - rendered} from cache: {output}")
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+
+DEFAULT_DATABASE_URI = "sqlite:///attendance.db"
+
+# Applied to every new SQLite connection. WAL lets the dashboard read while a
+# kiosk writes; NORMAL sync is durable across application crashes in WAL mode.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,            # ms to wait on a locked database instead of failing
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # bytes of the database file to memory-map
+    'cache_size': -64000,            # negative = KiB, so ~64MB page cache per connection
+    'temp_store': 'MEMORY',
+}
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+def engine_options(uri, pool_size=10, max_overflow=20, busy_timeout_ms=5000):
+    """SQLAlchemy engine options suited to the database behind ``uri``"""
+    if is_sqlite(uri):
+        if uri in ('sqlite://', 'sqlite:///:memory:'):
+            # An in-memory database only exists on one connection
+            return {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+        # Connections are pooled and handed between waitress threads, never
+        # used by two threads at once, so the same-thread check can go.
+        return {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_pre_ping': False,
+            'connect_args': {'check_same_thread': False, 'timeout': busy_timeout_ms / 1000.0},
+        }
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_recycle': 300,
+        'pool_pre_ping': True,
+    }
+
+def install_sqlite_pragmas(engine, pragmas):
+    """Run ``PRAGMA`` statements on every new connection of a SQLite engine"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def configure_database(app):
+    """Fill in database settings from the environment before ``db.init_app``"""
+    uri = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URI)
+    # Heroku-style URLs still use the scheme SQLAlchemy 1.4 dropped
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', uri)
+    app.config.setdefault('DB_POOL_SIZE', int(os.environ.get('DB_POOL_SIZE', '10')))
+    app.config.setdefault('DB_MAX_OVERFLOW', int(os.environ.get('DB_MAX_OVERFLOW', '20')))
+    app.config.setdefault('SQLITE_PRAGMAS', dict(DEFAULT_SQLITE_PRAGMAS))
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        pool_size=app.config['DB_POOL_SIZE'],
+        max_overflow=app.config['DB_MAX_OVERFLOW'],
+        busy_timeout_ms=app.config['SQLITE_PRAGMAS'].get('busy_timeout', 5000),
+    ))
+
+def init_engine(app, db):
+    """Attach connection-level tuning once the engine exists; needs an app context"""
+    install_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
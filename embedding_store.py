@@ -0,0 +1,154 @@
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+class EmbeddingStore:
+    """Append-only on-disk embedding matrix shared between worker processes.
+
+    Two flat files live in ``directory``:
+
+    * ``embeddings.f32`` - ``N x dim`` little-endian float32 rows
+    * ``embeddings.ids`` - ``N`` little-endian int64 student ids
+
+    Rows are appended in place on registration. Deleting a student writes a
+    tombstone (id ``-1``) over its index entry, and the files are compacted
+    once enough dead rows accumulate. Readers map both files with
+    ``np.memmap`` so every worker shares the same page-cache pages.
+    """
+
+    TOMBSTONE = -1
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, directory, dim):
+        self.directory = directory
+        self.dim = dim
+        self.vectors_path = os.path.join(directory, 'embeddings.f32')
+        self.ids_path = os.path.join(directory, 'embeddings.ids')
+        self.lock_path = os.path.join(directory, 'embeddings.lock')
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, exclusive):
+        """Serialize writers across threads and (on POSIX) across processes"""
+        if exclusive:
+            self._thread_lock.acquire()
+        handle = None
+        try:
+            if fcntl is not None:
+                os.makedirs(self.directory, exist_ok=True)
+                handle = open(self.lock_path, 'a')
+                fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            if handle is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            if exclusive:
+                self._thread_lock.release()
+
+    def _row_count(self):
+        if not os.path.exists(self.ids_path) or not os.path.exists(self.vectors_path):
+            return 0
+        ids_rows = os.path.getsize(self.ids_path) // 8
+        vector_rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+        # A crash between the two appends leaves one file a row ahead; ignore the partial row
+        return min(ids_rows, vector_rows)
+
+    def signature(self):
+        """Cheap fingerprint that changes whenever the store is written"""
+        try:
+            st = os.stat(self.ids_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def open(self):
+        """Map the store read-only, returning ``(ids, vectors)``"""
+        with self._locked(exclusive=False):
+            rows = self._row_count()
+            if rows == 0:
+                return np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32)
+            ids = np.memmap(self.ids_path, dtype='<i8', mode='r', shape=(rows,))
+            vectors = np.memmap(self.vectors_path, dtype='<f4', mode='r', shape=(rows, self.dim))
+            return ids, vectors
+
+    def _tombstone(self, student_ids):
+        rows = self._row_count()
+        if rows == 0:
+            return 0
+        ids = np.memmap(self.ids_path, dtype='<i8', mode='r+', shape=(rows,))
+        hits = np.isin(ids, np.atleast_1d(student_ids))
+        removed = int(hits.sum())
+        if removed:
+            ids[hits] = self.TOMBSTONE
+            ids.flush()
+        del ids
+        return removed
+
+    def append(self, student_id, embedding):
+        """Store an embedding, replacing any previous one for the student"""
+        self.append_many([student_id], [embedding])
+
+    def append_many(self, student_ids, embeddings):
+        """Store several embeddings in one locked write"""
+        if len(student_ids) == 0:
+            return
+        rows = np.asarray(embeddings, dtype='<f4').reshape(len(student_ids), self.dim)
+        ids = np.asarray(student_ids, dtype='<i8')
+        with self._locked(exclusive=True):
+            self._tombstone(ids)
+            count = self._row_count()
+            # Vectors first, so a reader never sees an id without its row
+            with open(self.vectors_path, 'r+b' if os.path.exists(self.vectors_path) else 'wb') as f:
+                f.seek(count * self.dim * 4)
+                f.write(rows.tobytes())
+                f.truncate()
+            with open(self.ids_path, 'r+b' if os.path.exists(self.ids_path) else 'wb') as f:
+                f.seek(count * 8)
+                f.write(ids.tobytes())
+                f.truncate()
+
+    def remove(self, student_id):
+        """Tombstone a student's rows; compacts when enough rows are dead"""
+        with self._locked(exclusive=True):
+            removed = self._tombstone(student_id)
+            if removed:
+                self._maybe_compact()
+            return removed > 0
+
+    def _maybe_compact(self):
+        rows = self._row_count()
+        if rows == 0:
+            return
+        ids = np.fromfile(self.ids_path, dtype='<i8', count=rows)
+        if (ids == self.TOMBSTONE).sum() >= max(1, rows * self.COMPACT_RATIO):
+            self._compact()
+
+    def compact(self):
+        """Rewrite the store without tombstoned rows"""
+        with self._locked(exclusive=True):
+            self._compact()
+
+    def _compact(self):
+        rows = self._row_count()
+        if rows == 0:
+            return
+        ids = np.fromfile(self.ids_path, dtype='<i8', count=rows)
+        vectors = np.fromfile(self.vectors_path, dtype='<f4', count=rows * self.dim).reshape(rows, self.dim)
+        live = ids != self.TOMBSTONE
+        vectors_tmp = self.vectors_path + '.tmp'
+        ids_tmp = self.ids_path + '.tmp'
+        vectors[live].tofile(vectors_tmp)
+        ids[live].tofile(ids_tmp)
+        os.replace(vectors_tmp, self.vectors_path)
+        os.replace(ids_tmp, self.ids_path)
+
+    def __contains__(self, student_id):
+        ids, _ = self.open()
+        return bool((ids == student_id).any())
@@ -0,0 +1,359 @@
+import csv
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from face_detection import detect_faces
+from face_embedding import compute_face_embedding
+from image_pipeline import WEBP_SUPPORTED, photo_digest, write_derivatives, move_photo, remove_photo
+from worker_pool import pool_context
+
+ROSTER_FIELDS = ['student_id', 'first_name', 'last_name', 'phone', 'class_name', 'section',
+                 'father_name', 'mother_name', 'address']
+REQUIRED_FIELDS = ['student_id', 'first_name', 'last_name', 'class_name', 'section']
+PHOTO_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif']
+REPORT_FIELDS = ['row', 'student_id', 'status', 'message']
+PHOTO_DIR = os.path.join('static', 'photos')
+# Upper bounds for an uploaded photo archive, checked before anything is unpacked
+MAX_ARCHIVE_ENTRIES = 10000
+MAX_ARCHIVE_BYTES = 2 * 1024 ** 3
+# Finished import jobs (and their reports) are forgotten after this many seconds
+IMPORT_JOB_TTL = 24 * 3600
+# Each job's work directory holds its state for every worker process to read
+STATUS_FILE = 'status.json'
+JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+# Pool workers only import this module, face_detection and face_embedding,
+# never the Flask app, so they start cheaply from the forkserver.
+# The database is the resume checkpoint: a student with a row and a stored
+# embedding is skipped, so an interrupted import can simply be run again.
+
+def find_photo(photo_dir, row):
+    """Locate a roster row's photo: an explicit ``photo`` column, else ``<student_id>.<ext>``"""
+    if row.get('photo'):
+        path = os.path.join(photo_dir, os.path.basename(row['photo']))
+        return path if os.path.exists(path) else None
+    for extension in PHOTO_EXTENSIONS:
+        for name in (f"{row['student_id']}.{extension}", f"{row['student_id']}.{extension.upper()}"):
+            path = os.path.join(photo_dir, name)
+            if os.path.exists(path):
+                return path
+    return None
+
+def process_photo(source_path, staged_stem, webp=WEBP_SUPPORTED):
+    """Pool worker: decode, detect, embed and write the photo derivatives as ``<staged_stem>_<digest>``.
+
+    Returns ``(embedding, digest, error)``; either ``error`` or the other two are ``None``.
+    """
+    try:
+        with open(source_path, 'rb') as f:
+            image = cv2.imdecode(np.frombuffer(f.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None, None, 'Invalid image file'
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = detect_faces(gray)
+        if len(faces) == 0:
+            return None, None, 'No face detected'
+        if len(faces) > 1:
+            return None, None, 'Multiple faces detected'
+        embedding = compute_face_embedding(gray, faces[0])
+        if embedding is None:
+            return None, None, 'Could not extract face features'
+        digest = photo_digest(image)
+        write_derivatives(image, f"{staged_stem}_{digest}.jpg", webp=webp)
+        return embedding, digest, None
+    except Exception as e:
+        return None, None, str(e)
+
+def read_roster(roster_path):
+    with open(roster_path, newline='', encoding='utf-8-sig') as f:
+        return [{k.strip(): (v or '').strip() for k, v in row.items() if k} for row in csv.DictReader(f)]
+
+class ImportReport:
+    """Per-row outcome of an import, optionally mirrored to a CSV file as it goes"""
+
+    def __init__(self, path=None, append=False):
+        self.rows = []
+        self.counts = {'enrolled': 0, 'skipped': 0, 'error': 0}
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            exists = append and os.path.exists(path)
+            self._file = open(path, 'a' if exists else 'w', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=REPORT_FIELDS)
+            if not exists:
+                self._writer.writeheader()
+
+    def add(self, row_number, student_id, status, message=''):
+        entry = {'row': row_number, 'student_id': student_id, 'status': status, 'message': message}
+        with self._lock:
+            self.rows.append(entry)
+            self.counts[status] += 1
+            if self._file:
+                self._writer.writerow(entry)
+                self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+def import_roster(roster_path, photo_dir, report=None, workers=None, batch_size=200, progress=None):
+    """Enroll every roster row that is not already enrolled; needs an app context"""
+    from app import app, db
+    from models import Student
+    from face_gallery import gallery
+
+    report = report or ImportReport()
+    rows = read_roster(roster_path)
+    existing = dict(db.session.query(Student.student_id, Student.id))
+    stored_ids, _ = gallery.store.open()
+    enrolled = set(np.asarray(stored_ids).tolist())
+    os.makedirs(PHOTO_DIR, exist_ok=True)
+
+    pending = []
+    seen = set()
+    for row_number, row in enumerate(rows, start=2):  # row 1 is the header
+        student_id = row.get('student_id', '')
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            report.add(row_number, student_id, 'error', f"Missing {', '.join(missing)}")
+            continue
+        if student_id in seen:
+            report.add(row_number, student_id, 'error', 'Duplicate student_id in roster')
+            continue
+        seen.add(student_id)
+        if existing.get(student_id) in enrolled:
+            report.add(row_number, student_id, 'skipped', 'Already enrolled')
+            continue
+        photo = find_photo(photo_dir, row)
+        if photo is None:
+            report.add(row_number, student_id, 'error', 'Photo not found')
+            continue
+        pending.append((row_number, row, photo))
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            staged = [os.path.join(PHOTO_DIR, f"import_{uuid.uuid4().hex}") for _ in batch]
+            webp = [app.config.get('PHOTO_WEBP', WEBP_SUPPORTED)] * len(batch)
+            results = list(pool.map(process_photo, [photo for _, _, photo in batch], staged, webp))
+            _commit_batch(db, Student, gallery, batch, staged, results, existing, report)
+            if progress:
+                progress(min(start + batch_size, len(pending)), len(pending))
+    return report
+
+def _commit_batch(db, Student, gallery, batch, staged, results, existing, report):
+    """Insert one batch of processed rows in a single transaction"""
+    accepted = []
+    replaced = []
+    for (row_number, row, _), staged_stem, (embedding, digest, error) in zip(batch, staged, results):
+        if error:
+            report.add(row_number, row['student_id'], 'error', error)
+            continue
+        student = db.session.get(Student, existing[row['student_id']]) if row['student_id'] in existing else None
+        if student is None:
+            student = Student(**{field: row.get(field, '') for field in ROSTER_FIELDS})
+            db.session.add(student)
+        elif student.photo_path:
+            replaced.append((student, student.photo_path))
+        accepted.append((row_number, row, student, f"{staged_stem}_{digest}.jpg", digest, embedding))
+    try:
+        db.session.flush()  # assigns ids to the new rows
+        for _, _, student, staged_path, digest, _ in accepted:
+            photo_filename = f"student_{student.id}_{digest}.jpg"
+            move_photo(staged_path, os.path.join(PHOTO_DIR, photo_filename))
+            student.photo_path = f"photos/{photo_filename}"
+            student.face_encoding_path = gallery.store.vectors_path
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        for row_number, row, _, staged_path, _, _ in accepted:
+            remove_photo(staged_path)
+            report.add(row_number, row['student_id'], 'error', f'Database error: {str(e)}')
+        return
+    # Rows are committed first; a crash before this line leaves students without
+    # embeddings, which the next run picks up again.
+    gallery.add_many([student.id for _, _, student, *_ in accepted], [e for *_, e in accepted])
+    for student, old_path in replaced:
+        if old_path != student.photo_path:
+            remove_photo(os.path.join('static', old_path))
+    for row_number, row, student, *_ in accepted:
+        existing[row['student_id']] = student.id
+        report.add(row_number, row['student_id'], 'enrolled')
+
+def extract_photos(archive, destination, max_entries=MAX_ARCHIVE_ENTRIES, max_bytes=MAX_ARCHIVE_BYTES):
+    """Unpack image files from a zip upload, flattening paths so nothing escapes ``destination``.
+
+    Raises ``ValueError`` when the archive has more than ``max_entries``
+    photos or they unpack to more than ``max_bytes``.
+    """
+    import zipfile
+    extracted = 0
+    with zipfile.ZipFile(archive) as bundle:
+        members = []
+        for member in bundle.infolist():
+            name = os.path.basename(member.filename)
+            if member.is_dir() or not name or name.startswith('.'):
+                continue
+            if name.rsplit('.', 1)[-1].lower() not in PHOTO_EXTENSIONS:
+                continue
+            members.append((member, name))
+        if len(members) > max_entries:
+            raise ValueError(f'Archive has {len(members)} photos; the limit is {max_entries}')
+        if sum(member.file_size for member, _ in members) > max_bytes:
+            raise ValueError(f'Photos unpack to more than {max_bytes // 1024 ** 2} MB')
+        # zipfile stops each entry at its declared size, so the sum above bounds what is written
+        for member, name in members:
+            with bundle.open(member) as src, open(os.path.join(destination, name), 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            extracted += 1
+    return extracted
+
+def new_import_workdir(import_dir):
+    """Create the work directory of a new import job; its name is the job id"""
+    os.makedirs(import_dir, exist_ok=True)
+    workdir = os.path.join(import_dir, uuid.uuid4().hex)
+    os.mkdir(workdir)
+    return workdir
+
+class ImportJob:
+    """A bulk import running on a background thread.
+
+    Its state is saved to ``status.json`` in the work directory after every
+    batch, so status requests that land on another worker process are
+    answered from the file (see ``get_import_job``).
+    """
+
+    def __init__(self, workdir):
+        self.id = os.path.basename(workdir)
+        self.workdir = workdir
+        self.report_path = os.path.join(workdir, 'report.csv')
+        self.status_path = os.path.join(workdir, STATUS_FILE)
+        self.report = ImportReport(self.report_path)
+        self.status = 'queued'
+        self.processed = 0
+        self.total = 0
+        self.error = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'counts': dict(self.report.counts),
+            'errors': [row for row in self.report.rows if row['status'] == 'error'],
+            'error': self.error,
+        }
+
+    def save(self):
+        staged = f"{self.status_path}.tmp"
+        with open(staged, 'w') as f:
+            json.dump({**self.to_dict(), 'finished_at': self.finished_at}, f)
+        os.replace(staged, self.status_path)
+
+class StoredImportJob:
+    """An import job as last saved by the process running it"""
+
+    def __init__(self, workdir, state):
+        self.id = os.path.basename(workdir)
+        self.workdir = workdir
+        self.report_path = os.path.join(workdir, 'report.csv')
+        self.status_path = os.path.join(workdir, STATUS_FILE)
+        self.finished_at = state.pop('finished_at', None)
+        self.state = state
+
+    def to_dict(self):
+        return dict(self.state)
+
+# Jobs started by this process; every other job is read back from its status file
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _load_job(workdir):
+    try:
+        with open(os.path.join(workdir, STATUS_FILE)) as f:
+            return StoredImportJob(workdir, json.load(f))
+    except (OSError, ValueError):
+        return None
+
+def _evict_jobs(import_dir, now):
+    """Delete the work directories of finished jobs older than ``IMPORT_JOB_TTL``; needs ``_jobs_lock``.
+
+    A job that stopped saving its status that long ago (its process died)
+    is removed as well.
+    """
+    try:
+        names = os.listdir(import_dir)
+    except OSError:
+        return
+    for name in names:
+        workdir = os.path.join(import_dir, name)
+        job = _jobs.get(name) or _load_job(workdir)
+        if job is not None and job.finished_at is not None:
+            expired = now - job.finished_at > IMPORT_JOB_TTL
+        elif name in _jobs:
+            expired = False
+        else:
+            try:
+                expired = now - os.path.getmtime(job.status_path if job else workdir) > IMPORT_JOB_TTL
+            except OSError:
+                continue
+        if expired:
+            _jobs.pop(name, None)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def start_import_job(app, workdir, roster_path, photo_dir, **kwargs):
+    """Run import_roster in a thread with its own app context and return the job.
+
+    ``workdir`` comes from ``new_import_workdir`` and belongs to the job from
+    here on: the roster and photos are deleted when the import ends, the
+    report and status when the job is evicted.
+    """
+    job = ImportJob(workdir)
+
+    def progress(done, total):
+        job.processed, job.total = done, total
+        job.save()
+
+    def run():
+        job.status = 'running'
+        job.save()
+        with app.app_context():
+            try:
+                import_roster(roster_path, photo_dir, report=job.report, progress=progress, **kwargs)
+                job.status = 'finished'
+            except Exception as e:
+                app.logger.error(f"Bulk import {job.id} failed: {str(e)}")
+                job.status = 'failed'
+                job.error = str(e)
+            finally:
+                job.report.close()
+                shutil.rmtree(photo_dir, ignore_errors=True)
+                if os.path.exists(roster_path):
+                    os.remove(roster_path)
+                job.finished_at = time.time()
+                job.save()
+
+    job.save()
+    with _jobs_lock:
+        _evict_jobs(os.path.dirname(workdir), time.time())
+        _jobs[job.id] = job
+    threading.Thread(target=run, name=f'bulk-import-{job.id[:8]}', daemon=True).start()
+    return job
+
+def get_import_job(import_dir, job_id):
+    """The job with this id, whichever worker process started it, or ``None``"""
+    if not JOB_ID.fullmatch(job_id):
+        return None
+    with _jobs_lock:
+        _evict_jobs(import_dir, time.time())
+        return _jobs.get(job_id) or _load_job(os.path.join(import_dir, job_id))
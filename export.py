@@ -0,0 +1,125 @@
+import csv
+import io
+from sqlalchemy import select
+from app import db
+from models import Student, AttendanceRecord
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+EXPORT_COLUMNS = ['date', 'timestamp', 'student_id', 'first_name', 'last_name', 'class_name', 'section', 'status', 'confidence']
+BATCH_ROWS = 5000
+
+def parquet_available():
+    return pa is not None
+
+def attendance_rows(start_date, end_date, class_name=None, section=None, batch_rows=BATCH_ROWS):
+    """Yield attendance rows joined to student details without loading them all at once"""
+    query = select(
+        AttendanceRecord.date,
+        AttendanceRecord.timestamp,
+        Student.student_id,
+        Student.first_name,
+        Student.last_name,
+        Student.class_name,
+        Student.section,
+        AttendanceRecord.status,
+        AttendanceRecord.confidence,
+    ).join(Student, Student.id == AttendanceRecord.student_id).where(
+        AttendanceRecord.date >= start_date,
+        AttendanceRecord.date <= end_date,
+    ).order_by(AttendanceRecord.date, AttendanceRecord.timestamp, AttendanceRecord.id)
+    if class_name:
+        query = query.where(Student.class_name == class_name)
+    if section:
+        query = query.where(Student.section == section)
+    # stream_results uses a server-side cursor where the driver has one
+    result = db.session.execute(query.execution_options(stream_results=True, yield_per=batch_rows))
+    try:
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        result.close()
+
+def iter_csv(rows):
+    """Encode rows as CSV, one chunk per batch of lines"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 0
+    for row in rows:
+        writer.writerow([
+            row.date.isoformat() if row.date else '',
+            row.timestamp.isoformat(sep=' ', timespec='seconds') if row.timestamp else '',
+            row.student_id, row.first_name, row.last_name, row.class_name, row.section,
+            row.status, '' if row.confidence is None else f'{row.confidence:.3f}',
+        ])
+        pending += 1
+        if pending >= 1000:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+def _arrow_schema():
+    # Every field is nullable, so a missing date or timestamp is written as null
+    return pa.schema([
+        ('date', pa.date32()),
+        ('timestamp', pa.timestamp('s')),
+        ('student_id', pa.string()),
+        ('first_name', pa.string()),
+        ('last_name', pa.string()),
+        ('class_name', pa.string()),
+        ('section', pa.string()),
+        ('status', pa.string()),
+        ('confidence', pa.float64()),
+    ])
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return b''.join(chunks)
+
+def iter_parquet(rows, batch_rows=BATCH_ROWS):
+    """Encode rows as a Parquet file, yielding bytes as each row group is written"""
+    if pa is None:
+        raise RuntimeError('Parquet export requires the optional pyarrow package')
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    columns = {name: [] for name in EXPORT_COLUMNS}
+
+    def write_batch():
+        writer.write_table(pa.table(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    try:
+        for row in rows:
+            for name in EXPORT_COLUMNS:
+                columns[name].append(getattr(row, name))
+            if len(columns['date']) >= batch_rows:
+                write_batch()
+                yield sink.drain()
+        if columns['date']:
+            write_batch()
+    finally:
+        writer.close()
+    yield sink.drain()
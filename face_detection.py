@@ -0,0 +1,96 @@
+import threading
+import cv2
+
+CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+# Frames are scanned at no more than this many pixels on the long edge
+DETECTION_MAX_DIM = 320
+MIN_FACE_SIZE = (80, 80)
+
+_local = threading.local()
+
+def get_cascade():
+    """Return this thread's Haar cascade, loading the XML only once per thread"""
+    cascade = getattr(_local, 'cascade', None)
+    if cascade is None:
+        cascade = cv2.CascadeClassifier(CASCADE_PATH)
+        if cascade.empty():
+            raise RuntimeError(f"Could not load face cascade from {CASCADE_PATH}")
+        _local.cascade = cascade
+    return cascade
+
+def detect_faces(gray, max_dim=DETECTION_MAX_DIM, min_size=MIN_FACE_SIZE, scale_factor=1.1, min_neighbors=5):
+    """Detect faces in a grayscale image, largest first.
+
+    The image is downscaled so its long edge is at most ``max_dim`` before
+    running the cascade; boxes are mapped back to full-resolution
+    ``(x, y, w, h)`` tuples.
+    """
+    height, width = gray.shape[:2]
+    scale = 1.0
+    small = gray
+    if max_dim and max(height, width) > max_dim:
+        scale = max_dim / float(max(height, width))
+        small = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    scaled_min = (max(int(min_size[0] * scale), 20), max(int(min_size[1] * scale), 20))
+    found = get_cascade().detectMultiScale(small, scaleFactor=scale_factor, minNeighbors=min_neighbors, minSize=scaled_min)
+    faces = [tuple(int(round(v / scale)) for v in box) for box in found]
+    faces.sort(key=lambda box: box[2] * box[3], reverse=True)
+    return faces
+
+class FaceTracker:
+    """Remembers the last face box of a camera and searches near it first.
+
+    A kiosk user barely moves between frames, so scanning a padded window
+    around the previous box is much cheaper than scanning the whole frame.
+    The full frame is only searched when the window comes up empty.
+    """
+
+    def __init__(self, padding=0.5, max_misses=3):
+        self.padding = padding
+        self.max_misses = max_misses
+        self.last_box = None
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def detect(self, gray, **kwargs):
+        with self._lock:
+            last_box = self.last_box
+        faces = []
+        if last_box is not None:
+            faces = self._detect_in_roi(gray, last_box, **kwargs)
+        if not faces:
+            faces = detect_faces(gray, **kwargs)
+        with self._lock:
+            if faces:
+                self.last_box, self.misses = faces[0], 0
+            else:
+                self.misses += 1
+                if self.misses >= self.max_misses:
+                    self.last_box = None
+        return faces
+
+    def _detect_in_roi(self, gray, box, **kwargs):
+        x, y, w, h = box
+        pad_w, pad_h = int(w * self.padding), int(h * self.padding)
+        height, width = gray.shape[:2]
+        x0, y0 = max(x - pad_w, 0), max(y - pad_h, 0)
+        x1, y1 = min(x + w + pad_w, width), min(y + h + pad_h, height)
+        if x1 <= x0 or y1 <= y0:
+            return []
+        faces = detect_faces(gray[y0:y1, x0:x1], **kwargs)
+        return [(fx + x0, fy + y0, fw, fh) for fx, fy, fw, fh in faces]
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+MAX_TRACKERS = 256
+
+def get_tracker(key):
+    """Return the ROI tracker for a camera, creating it on first use"""
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            if len(_trackers) >= MAX_TRACKERS:
+                _trackers.pop(next(iter(_trackers)))
+            tracker = _trackers[key] = FaceTracker()
+        return tracker
@@ -0,0 +1,22 @@
+import cv2
+import numpy as np
+
+EMBEDDING_SIZE = (16, 16)
+EMBEDDING_DIM = EMBEDDING_SIZE[0] * EMBEDDING_SIZE[1]
+
+def compute_face_embedding(gray, face_region):
+    """Compute a normalized embedding vector for a face region of a grayscale image"""
+    x, y, w, h = [int(v) for v in face_region]
+    height, width = gray.shape[:2]
+    x, y = max(x, 0), max(y, 0)
+    w, h = min(w, width - x), min(h, height - y)
+    if w <= 0 or h <= 0:
+        return None
+    face = cv2.resize(gray[y:y + h, x:x + w], EMBEDDING_SIZE, interpolation=cv2.INTER_AREA)
+    face = cv2.equalizeHist(face)
+    embedding = face.astype(np.float32).ravel()
+    embedding -= embedding.mean()
+    norm = np.linalg.norm(embedding)
+    if norm == 0:
+        return None
+    return embedding / norm
@@ -0,0 +1,101 @@
+import os
+import threading
+import numpy as np
+from app import app
+from embedding_store import EmbeddingStore
+from matchers import make_matcher
+from face_embedding import EMBEDDING_DIM, compute_face_embedding
+
+ENCODING_DIR = 'static/face_encodings'
+
+# Cosine similarity at which a match is considered 50% likely, and how sharply
+# confidence rises around it. Tuned for the normalized-pixel embedding.
+MATCH_SIMILARITY = 0.80
+CONFIDENCE_SLOPE = 20.0
+
+def similarity_to_confidence(similarity):
+    """Map cosine similarity onto a 0..1 confidence with a logistic curve"""
+    return 1.0 / (1.0 + np.exp(-CONFIDENCE_SLOPE * (np.asarray(similarity) - MATCH_SIMILARITY)))
+
+class FaceGallery:
+    """Process-wide view of student face embeddings for vectorized matching.
+
+    The matrix is memory-mapped from the shared ``EmbeddingStore``, so loading
+    is a couple of syscalls regardless of enrollment size. Each match checks
+    the store's fingerprint and remaps it when another worker has written;
+    the ``matcher`` (see matchers.py) then indexes only the rows that changed.
+    """
+
+    def __init__(self, encoding_dir=ENCODING_DIR, matcher=None):
+        self.store = EmbeddingStore(encoding_dir, EMBEDDING_DIM)
+        self.matcher = matcher or make_matcher('exact')
+        self._lock = threading.Lock()
+        self._signature = False
+
+    def __len__(self):
+        self._refresh()
+        return self.matcher.describe()['rows']
+
+    def _refresh(self):
+        if self.store.signature() != self._signature:
+            self.load()
+
+    def load(self):
+        """(Re)map the embedding store"""
+        signature = self.store.signature()
+        try:
+            ids, matrix = self.store.open()
+        except Exception as e:
+            app.logger.error(f"Error loading face embeddings: {str(e)}")
+            return
+        with self._lock:
+            self.matcher.sync(ids, matrix)
+            self._signature = signature
+        if len(ids) == 0 and os.path.isdir(self.store.directory) and any(name.endswith('.pkl') for name in os.listdir(self.store.directory)):
+            app.logger.warning("Legacy .pkl face encodings found; run 'flask migrate-encodings' to import them")
+
+    def add(self, student_id, embedding):
+        """Insert or replace the embedding for a student"""
+        self.store.append(student_id, embedding)
+        self.load()
+
+    def add_many(self, student_ids, embeddings):
+        """Insert or replace several embeddings with a single store write"""
+        self.store.append_many(student_ids, embeddings)
+        self.load()
+
+    def remove(self, student_id):
+        """Drop a student's embedding; returns True if one was present"""
+        removed = self.store.remove(student_id)
+        self.load()
+        return removed
+
+    def match(self, embedding, top_k=3, candidates=None):
+        """Return up to ``top_k`` candidates ordered by cosine similarity.
+
+        Each candidate is a dict with ``student_id``, ``similarity`` and a
+        calibrated ``confidence``. ``candidates`` restricts the search to
+        those student ids.
+        """
+        return self.match_many([embedding], top_k=top_k, candidates=candidates)[0]
+
+    def match_many(self, embeddings, top_k=3, candidates=None):
+        """Match several probes with a single matrix multiply; one candidate list per probe"""
+        self._refresh()
+        if len(embeddings) == 0:
+            return []
+        probes = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        results = []
+        for student_ids, similarities in self.matcher.search(probes, top_k, candidates=candidates):
+            confidences = similarity_to_confidence(similarities)
+            results.append([
+                {'student_id': int(student_id), 'similarity': float(similarity), 'confidence': round(float(c), 3)}
+                for student_id, similarity, c in zip(student_ids, similarities, confidences)
+            ])
+        return results
+
+gallery = FaceGallery(matcher=make_matcher(
+    app.config.get('FACE_MATCHER', 'exact'),
+    nlist=app.config.get('FACE_MATCHER_NLIST'),
+    nprobe=app.config.get('FACE_MATCHER_NPROBE', 16),
+))
@@ -0,0 +1,184 @@
+import glob
+import hashlib
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from worker_pool import pool_context
+
+try:
+    import qrcode
+except ImportError:  # cards are rendered without the QR code
+    qrcode = None
+
+# CR80 card, portrait, at 300 dpi; sheets are A4 at the same resolution
+DPI = 300
+CARD_SIZE = (638, 1011)
+SHEET_SIZE = (2480, 3508)
+SHEET_MARGIN = 120
+SHEET_GAP = 40
+# Bump whenever the drawing code changes so every cached card is re-rendered
+RENDER_VERSION = 1
+
+HEADER_COLOR = (55, 90, 158)
+ACCENT_COLOR = (78, 115, 223)
+TEXT_COLOR = (45, 62, 80)
+MUTED_COLOR = (110, 120, 135)
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'image', 'ico.png')
+
+# Pool workers only import this module and PIL, never the Flask app.
+
+def _font(size, bold=False):
+    for name in (('DejaVuSans-Bold.ttf', 'Arial Bold.ttf') if bold else ('DejaVuSans.ttf', 'Arial.ttf')):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+def card_key(fields, settings, photo_path):
+    """Cache key: a hash of the printed fields, the school settings and the photo bytes"""
+    digest = hashlib.sha256(json.dumps([RENDER_VERSION, fields, settings], sort_keys=True, default=str).encode())
+    if photo_path and os.path.exists(photo_path):
+        with open(photo_path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:20]
+
+def _fit(draw, text, font, width):
+    """Trim ``text`` with an ellipsis until it fits in ``width`` pixels"""
+    text = str(text or '')
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text + '…'
+
+def render_card(fields, settings, photo_path, card_path):
+    """Pool worker: draw one ID card as a PNG, replacing ``card_path`` atomically; returns the path"""
+    width, height = CARD_SIZE
+    card = Image.new('RGB', CARD_SIZE, (248, 250, 252))
+    draw = ImageDraw.Draw(card)
+
+    # Header band with logo and school details
+    draw.rectangle([0, 0, width, 190], fill=HEADER_COLOR)
+    if os.path.exists(LOGO_PATH):
+        with Image.open(LOGO_PATH) as logo:
+            logo = ImageOps.contain(logo.convert('RGBA'), (120, 120))
+            card.paste(logo, (36, 35), logo)
+    draw.text((176, 50), _fit(draw, settings['school_name'], _font(40, bold=True), width - 200), font=_font(40, bold=True), fill='white')
+    draw.text((176, 110), _fit(draw, settings['school_address'], _font(26), width - 200), font=_font(26), fill=(225, 232, 245))
+
+    # Round photo
+    diameter = 300
+    top = 230
+    left = (width - diameter) // 2
+    draw.ellipse([left - 10, top - 10, left + diameter + 10, top + diameter + 10], fill=ACCENT_COLOR)
+    if photo_path and os.path.exists(photo_path):
+        with Image.open(photo_path) as photo:
+            photo = ImageOps.fit(photo.convert('RGB'), (diameter, diameter), Image.Resampling.LANCZOS)
+        mask = Image.new('L', (diameter, diameter), 0)
+        ImageDraw.Draw(mask).ellipse([0, 0, diameter, diameter], fill=255)
+        card.paste(photo, (left, top), mask)
+    else:
+        draw.ellipse([left, top, left + diameter, top + diameter], fill=(234, 240, 251))
+
+    # Detail rows
+    label_font, value_font = _font(26, bold=True), _font(28)
+    class_label = f"{fields.get('class_name') or ''} - {fields.get('section') or ''}".strip(' -')
+    rows = [('Name', fields.get('name')), ('Student ID', fields.get('student_id')), ('Class', class_label),
+            ('Address', fields.get('address'))]
+    y = top + diameter + 50
+    for label, value in rows:
+        draw.text((48, y), f"{label}:", font=label_font, fill=HEADER_COLOR)
+        draw.text((230, y), _fit(draw, value, value_font, width - 280), font=value_font, fill=TEXT_COLOR)
+        y += 56
+
+    if qrcode is not None:
+        qr = qrcode.make(f"{fields.get('student_id')} {fields.get('name')} {class_label}").get_image().convert('RGB')
+        qr = qr.resize((150, 150), Image.Resampling.NEAREST)
+        card.paste(qr, ((width - 150) // 2, y + 4))
+
+    draw.rectangle([0, height - 70, width, height], fill=(233, 240, 251))
+    validity = settings['validity']
+    validity_font = _font(24)
+    draw.text(((width - draw.textlength(validity, font=validity_font)) / 2, height - 52), validity, font=validity_font, fill=MUTED_COLOR)
+    draw.rectangle([0, 0, width - 1, height - 1], outline=TEXT_COLOR, width=4)
+
+    staged_path = f"{card_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        card.save(staged_path, 'PNG', dpi=(DPI, DPI))
+        os.replace(staged_path, card_path)
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+    return card_path
+
+def render_cards(cards, cache_dir, settings, workers=None):
+    """Render every card that is not already cached.
+
+    ``cards`` is a list of ``(card_id, fields, photo_path)``. Returns
+    ``(paths, rendered)``: the card PNGs in input order and how many had to
+    be drawn. Superseded renders of the same card are removed.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    paths, missing = [], []
+    for card_id, fields, photo_path in cards:
+        path = os.path.join(cache_dir, f"card_{card_id}_{card_key(fields, settings, photo_path)}.png")
+        paths.append(path)
+        if not os.path.exists(path):
+            missing.append((card_id, fields, photo_path, path))
+    if len(missing) == 1:
+        _, fields, photo_path, path = missing[0]
+        render_card(fields, settings, photo_path, path)
+    elif missing:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+            list(pool.map(render_card, *zip(*[(fields, settings, photo_path, path) for _, fields, photo_path, path in missing])))
+    for card_id, _, _, path in missing:
+        for stale in glob.glob(os.path.join(cache_dir, f"card_{card_id}_*.png")):
+            if stale != path:
+                os.remove(stale)
+    return paths, len(missing)
+
+def sheet_layout(sheet_size=SHEET_SIZE):
+    """Columns and rows of cards that fit on one sheet"""
+    usable_w, usable_h = sheet_size[0] - 2 * SHEET_MARGIN, sheet_size[1] - 2 * SHEET_MARGIN
+    columns = max(1, (usable_w + SHEET_GAP) // (CARD_SIZE[0] + SHEET_GAP))
+    rows = max(1, (usable_h + SHEET_GAP) // (CARD_SIZE[1] + SHEET_GAP))
+    return columns, rows
+
+def build_sheets(card_paths, sheet_size=SHEET_SIZE):
+    """Lay the cards out on as many print sheets as needed; returns PIL images"""
+    columns, rows = sheet_layout(sheet_size)
+    per_sheet = columns * rows
+    grid_w = columns * CARD_SIZE[0] + (columns - 1) * SHEET_GAP
+    left = (sheet_size[0] - grid_w) // 2
+    sheets = []
+    for start in range(0, len(card_paths), per_sheet):
+        sheet = Image.new('RGB', sheet_size, 'white')
+        for i, path in enumerate(card_paths[start:start + per_sheet]):
+            x = left + (i % columns) * (CARD_SIZE[0] + SHEET_GAP)
+            y = SHEET_MARGIN + (i // columns) * (CARD_SIZE[1] + SHEET_GAP)
+            with Image.open(path) as card:
+                sheet.paste(card, (x, y))
+        sheets.append(sheet)
+    return sheets
+
+def write_sheet(card_paths, out_path, fmt='pdf'):
+    """Write the print sheet: a multi-page PDF, or one PNG montage of every card"""
+    staged_path = f"{out_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        if fmt == 'pdf':
+            sheets = build_sheets(card_paths) or [Image.new('RGB', SHEET_SIZE, 'white')]
+            sheets[0].save(staged_path, 'PDF', resolution=DPI, save_all=True, append_images=sheets[1:])
+        else:
+            columns, _ = sheet_layout()
+            rows = max(1, -(-len(card_paths) // columns))
+            height = 2 * SHEET_MARGIN + rows * CARD_SIZE[1] + (rows - 1) * SHEET_GAP
+            montage = build_sheets(card_paths, (SHEET_SIZE[0], height))
+            (montage[0] if montage else Image.new('RGB', (SHEET_SIZE[0], height), 'white')).save(staged_path, 'PNG', dpi=(DPI, DPI))
+        os.replace(staged_path, out_path)
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+    return out_path
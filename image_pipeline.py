@@ -0,0 +1,149 @@
+import atexit
+import glob
+import hashlib
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from PIL import Image, features
+
+# Every enrolled photo is stored once per size. ``full`` keeps the plain
+# ``<stem>_<digest>.jpg`` name that ``Student.photo_path`` points at; the other
+# sizes and the WebP copies are siblings of it, so one path finds them all.
+PHOTO_SIZES = {'full': (640, 640), 'card': (320, 320), 'thumb': (128, 128)}
+PHOTO_QUALITY = 85
+WEBP_SUPPORTED = features.check('webp')
+# The digest in the name is what lets browsers cache a photo forever
+HASHED_PHOTO = re.compile(r'_[0-9a-f]{12}(?:_(?:card|thumb))?\.(?:jpg|webp)$')
+
+def photo_digest(image):
+    """Short content hash of a decoded photo, used in its file names"""
+    return hashlib.sha256(image.tobytes()).hexdigest()[:12]
+
+def photo_filename(stem, image):
+    return f"{stem}_{photo_digest(image)}.jpg"
+
+def is_hashed(photo_path):
+    return bool(photo_path and HASHED_PHOTO.search(photo_path))
+
+def derivative_path(photo_path, size='full', fmt='jpg'):
+    """Path of one size/format of ``photo_path``; legacy unhashed photos only have themselves"""
+    if not is_hashed(photo_path):
+        return photo_path
+    root = photo_path[:-len('.jpg')]
+    return f"{root}.{fmt}" if size == 'full' else f"{root}_{size}.{fmt}"
+
+def _save(photo, path, fmt, quality):
+    staged_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        if fmt == 'webp':
+            photo.save(staged_path, 'WEBP', quality=quality, method=4)
+        else:
+            photo.save(staged_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+        os.replace(staged_path, path)
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+
+def write_derivatives(image, photo_path, webp=WEBP_SUPPORTED, quality=PHOTO_QUALITY):
+    """Write every size of a decoded BGR array next to ``photo_path``, each replaced atomically.
+
+    Sizes are produced largest first, each one downscaled from the previous,
+    so only the first resample works on the full frame.
+    """
+    photo = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    for size, box in PHOTO_SIZES.items():
+        photo.thumbnail(box, Image.Resampling.LANCZOS)
+        _save(photo, derivative_path(photo_path, size), 'jpg', quality)
+        if webp:
+            _save(photo, derivative_path(photo_path, size, 'webp'), 'webp', quality)
+
+def photo_files(photo_path):
+    """Every file on disk belonging to ``photo_path`` (a path under the working directory)"""
+    if not is_hashed(photo_path):
+        return [photo_path] if os.path.exists(photo_path) else []
+    root = glob.escape(photo_path[:-len('.jpg')])
+    return glob.glob(f"{root}.*") + glob.glob(f"{root}_*")
+
+def move_photo(staged_path, photo_path):
+    """Rename every derivative written for ``staged_path`` to ``photo_path``'s names"""
+    for size in PHOTO_SIZES:
+        for fmt in ('jpg', 'webp'):
+            source = derivative_path(staged_path, size, fmt)
+            if os.path.exists(source):
+                os.replace(source, derivative_path(photo_path, size, fmt))
+
+def remove_photo(photo_path):
+    for path in photo_files(photo_path):
+        os.remove(path)
+
+class PhotoWriter:
+    """Bounded pool that resizes and encodes student photos off the request thread.
+
+    PIL and OpenCV release the GIL while resampling and encoding, so a few
+    threads are enough. At most ``PHOTO_WRITE_QUEUE`` photos may be waiting;
+    beyond that ``submit`` writes the photo inline, so a burst of
+    registrations slows down instead of holding unbounded decoded frames in
+    memory.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = 2
+        self.max_pending = 32
+        self.webp = WEBP_SUPPORTED
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.setdefault('PHOTO_WRITE_WORKERS', 2)
+        self.max_pending = app.config.setdefault('PHOTO_WRITE_QUEUE', 32)
+        self.webp = app.config.setdefault('PHOTO_WEBP', WEBP_SUPPORTED) and WEBP_SUPPORTED
+        app.extensions['photo_writer'] = self
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        # Pools do not survive fork(), so each worker process creates its own
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._slots = threading.BoundedSemaphore(self.max_pending)
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='photo-writer')
+
+    def _write(self, image, photo_path):
+        try:
+            write_derivatives(image, photo_path, webp=self.webp)
+        except Exception as e:
+            if self.app is not None:
+                self.app.logger.error(f"Error writing photo {photo_path}: {str(e)}")
+        finally:
+            self._slots.release()
+
+    def submit(self, image, photo_path):
+        """Write every size of ``image`` for ``photo_path`` in the background; inline when the queue is full"""
+        self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            write_derivatives(image, photo_path, webp=self.webp)
+            return None
+        try:
+            return self._executor.submit(self._write, image, photo_path)
+        except RuntimeError:  # pool already shut down at interpreter exit
+            self._slots.release()
+            write_derivatives(image, photo_path, webp=self.webp)
+            return None
+
+    def shutdown(self):
+        """Finish queued photo writes and stop the pool"""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+photo_writer = PhotoWriter()
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+def frame_hash(gray):
+    """64-bit difference hash of a grayscale frame.
+
+    The frame is shrunk to 9x8 and each bit records whether a pixel is
+    brighter than its right-hand neighbour, so sensor noise and small JPEG
+    differences leave the hash (nearly) unchanged.
+    """
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hash_distance(a, b):
+    return bin(a ^ b).count('1')
+
+class KioskSession:
+    """Per-camera state: the last frame's hash and response, recent recognitions and pacing"""
+
+    def __init__(self, min_interval_ms):
+        self.lock = threading.Lock()
+        self.last_hash = None
+        self.pending_hash = None
+        self.last_response = None
+        self.last_processed = 0.0
+        self.interval_ms = min_interval_ms
+        self.recent = {}  # student_id -> expiry (monotonic seconds)
+
+    def recently_recognized(self, student_id, now):
+        expiry = self.recent.get(student_id)
+        return expiry is not None and expiry > now
+
+    def remember(self, student_id, now, ttl):
+        self.recent = {sid: expiry for sid, expiry in self.recent.items() if expiry > now}
+        self.recent[student_id] = now + ttl
+
+class KioskSessions:
+    """Front door for kiosk recognition requests.
+
+    ``check_frame`` hashes a cheaply decoded thumbnail of each frame; when it
+    is within ``KIOSK_DEDUP_DISTANCE`` bits of the last processed frame (the
+    scene has not changed) the previous response is returned and recognition
+    is skipped. Every response carries ``next_capture_ms``: short while faces
+    are coming and going, backing off towards ``KIOSK_MAX_INTERVAL_MS`` while
+    the scene stays the same, and a pause after a successful mark.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.dedup_distance = 4
+        self.max_skip_seconds = 5.0
+        self.recognition_ttl = 30.0
+        self.min_interval_ms = 300
+        self.max_interval_ms = 2000
+        self.marked_interval_ms = 1500
+        self.max_sessions = 256
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.dedup_distance = app.config.setdefault('KIOSK_DEDUP_DISTANCE', 4)
+        self.max_skip_seconds = app.config.setdefault('KIOSK_MAX_SKIP_SECONDS', 5.0)
+        self.recognition_ttl = app.config.setdefault('KIOSK_RECOGNITION_TTL', 30.0)
+        self.min_interval_ms = app.config.setdefault('KIOSK_MIN_INTERVAL_MS', 300)
+        self.max_interval_ms = app.config.setdefault('KIOSK_MAX_INTERVAL_MS', 2000)
+        self.marked_interval_ms = app.config.setdefault('KIOSK_MARKED_INTERVAL_MS', 1500)
+        app.extensions['kiosk_sessions'] = self
+
+    def get(self, key):
+        """Return the session for a kiosk, evicting the least recently used one when full"""
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                if len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                session = self._sessions[key] = KioskSession(self.min_interval_ms)
+            else:
+                self._sessions.move_to_end(key)
+            return session
+
+    def check_frame(self, session, thumbnail):
+        """Return the cached response if this frame matches the last one, else None.
+
+        ``thumbnail`` is a small grayscale decode of the frame; the caller
+        records the real response with ``record`` after recognition. The
+        frame's hash only replaces the last one in ``record``, so a frame that
+        is rejected or fails is never paired with the previous response.
+        """
+        now = time.monotonic()
+        digest = frame_hash(thumbnail)
+        with session.lock:
+            unchanged = (
+                session.last_hash is not None
+                and session.last_response is not None
+                and hash_distance(digest, session.last_hash) <= self.dedup_distance
+                and now - session.last_processed < self.max_skip_seconds
+            )
+            if unchanged:
+                session.interval_ms = min(int(session.interval_ms * 1.5), self.max_interval_ms)
+                return dict(session.last_response, duplicate=True, next_capture_ms=session.interval_ms)
+            session.pending_hash = digest
+            return None
+
+    def recently_recognized(self, session, student_id):
+        with session.lock:
+            return session.recently_recognized(student_id, time.monotonic())
+
+    def record(self, session, response, student_id=None, marked=False, repeat=None):
+        """Attach ``next_capture_ms`` and keep the response (or ``repeat``) for duplicate frames"""
+        now = time.monotonic()
+        with session.lock:
+            if student_id is not None:
+                session.remember(student_id, now, self.recognition_ttl)
+            session.interval_ms = self.marked_interval_ms if marked else self.min_interval_ms
+            session.last_processed = now
+            session.last_hash, session.pending_hash = session.pending_hash, None
+            session.last_response = repeat if repeat is not None else response
+            return dict(response, next_capture_ms=session.interval_ms)
+
+    def reset(self):
+        with self._lock:
+            self._sessions.clear()
+
+kiosk_sessions = KioskSessions()
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from collections import deque
+from flask import request
+from app import app, db
+from face_detection import FaceTracker
+from metrics import metrics
+from recognition_pool import recognition_pool, PoolOverloaded, StageTimer
+from routes import kiosk_key, kiosk_session_for, recognize_kiosk_frame, mark_recognized, record_recognition
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:  # the streaming channel is optional
+    Sock = None
+    ConnectionClosed = Exception
+
+# WebSocket close code telling the kiosk to try again later (it stays on HTTP uploads meanwhile)
+TRY_AGAIN_LATER = 1013
+REFUSED_STREAMS = metrics.counter('kiosk_streams_refused_total', 'Kiosk WebSocket connections refused because KIOSK_STREAM_MAX were open')
+
+class FrameQueue:
+    """Bounded hand-off from the socket reader to the recognizer.
+
+    When the recognizer falls behind, the oldest waiting frame is dropped,
+    so it always works on the newest frame the kiosk has sent.
+    """
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.closed = False
+        self._frames = deque()
+        self._cond = threading.Condition()
+
+    def put(self, frame):
+        with self._cond:
+            if len(self._frames) >= self.maxsize:
+                self._frames.popleft()
+                self.dropped += 1
+            self._frames.append(frame)
+            self._cond.notify()
+
+    def get(self):
+        """Next frame, or None once the queue is closed and empty"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frames or self.closed)
+            return self._frames.popleft() if self._frames else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+def _read_frames(ws, frames):
+    """Socket reader thread: queue every binary message as ``(seq, received_at, bytes)``"""
+    seq = 0
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            if isinstance(message, str):
+                continue  # reserved for control messages
+            seq += 1
+            frames.put((seq, time.perf_counter(), message))
+    except ConnectionClosed:
+        pass
+    finally:
+        frames.close()
+
+def stream_kiosk(ws):
+    """Recognize binary frames pushed over a WebSocket and send back one JSON event per processed frame.
+
+    ``?kiosk=<id>`` names the kiosk and ``?scale=2|4|8`` decodes frames at
+    reduced resolution. Each connection has its own face tracker. A stream
+    holds a server thread (two while it reads) for as long as it is open,
+    so beyond ``KIOSK_STREAM_MAX`` open streams new ones are closed with
+    ``TRY_AGAIN_LATER``.
+    """
+    slots = app.extensions['kiosk_stream']
+    if not slots.acquire(blocking=False):
+        REFUSED_STREAMS.inc()
+        ws.close(reason=TRY_AGAIN_LATER, message='Too many kiosk streams')
+        return
+    try:
+        _recognize_stream(ws)
+    finally:
+        slots.release()
+
+def _recognize_stream(ws):
+    scale = request.args.get('scale', app.config['FRAME_DECODE_SCALE'], type=int)
+    tracker = FaceTracker() if app.config['FACE_TRACKING'] else None
+    frames = FrameQueue(app.config['KIOSK_STREAM_QUEUE'])
+    reader = threading.Thread(target=_read_frames, args=(ws, frames), name=f'kiosk-stream-{kiosk_key()}', daemon=True)
+    reader.start()
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        seq, received_at, image_bytes = item
+        timer = StageTimer()
+        try:
+            kiosk, result = kiosk_session_for(image_bytes)
+            if result is None:
+                recognized = recognition_pool.run(recognize_kiosk_frame, image_bytes, scale, tracker=tracker, timer=timer)
+                if recognized is None:
+                    result = {'success': False, 'message': 'Invalid image data'}
+                else:
+                    result = mark_recognized(recognized, kiosk, timer)
+        except PoolOverloaded as e:
+            result = {'success': False, 'message': 'Server busy, please retry', 'retry_after': e.retry_after, 'next_capture_ms': e.retry_after * 1000}
+        except Exception as e:
+            app.logger.error(f"Kiosk stream recognition error: {str(e)}")
+            result = {'success': False, 'message': 'Recognition failed'}
+        finally:
+            # The socket outlives any request: hand the connection back to the pool after every frame
+            db.session.remove()
+        record_recognition('kiosk_stream', result, timer)
+        event = dict(result, type='result', seq=seq, dropped=frames.dropped, timings=timer.as_dict(),
+                     elapsed_ms=round((time.perf_counter() - received_at) * 1000, 1))
+        try:
+            ws.send(json.dumps(event))
+        except ConnectionClosed:
+            break
+    frames.close()
+
+def init_stream(app):
+    """Register the kiosk WebSocket at /ws/kiosk when flask-sock is installed.
+
+    flask-sock needs a server that hands the raw socket to the application
+    (the Werkzeug dev server, gunicorn with threads, eventlet or gevent).
+    waitress cannot, so ``run.py`` leaves ``KIOSK_STREAM`` off.
+    """
+    app.config.setdefault('KIOSK_STREAM_QUEUE', 1)
+    app.config.setdefault('KIOSK_STREAM_MAX', 32)
+    app.config.setdefault('SOCK_SERVER_OPTIONS', {'max_message_size': app.config['MAX_CONTENT_LENGTH'], 'ping_interval': 25})
+    if Sock is None:
+        app.config['KIOSK_STREAM'] = False
+        app.logger.info("flask-sock not installed; kiosks will use HTTP frame uploads")
+        return None
+    app.extensions['kiosk_stream'] = threading.BoundedSemaphore(app.config['KIOSK_STREAM_MAX'])
+    sock = Sock(app)
+    sock.route('/ws/kiosk', endpoint='kiosk_stream')(stream_kiosk)
+    app.config['KIOSK_STREAM'] = True
+    return sock
@@ -1,4 +1,12 @@
-from app import app
+from app import create_app, preload
+
+app = create_app()
+# Under gunicorn --preload this runs once in the master and the forked workers share the result
+if app.config['PRELOAD']:
+    preload(app)
 
 if __name__ == '__main__':
+    from commands import init_database
+    with app.app_context():
+        init_database()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,215 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+TOMBSTONE = -1
+
+class Matcher(ABC):
+    """Nearest-neighbour search over the rows of the embedding store.
+
+    Matchers index row positions, not student ids. ``sync`` is handed the
+    store's current ``(ids, vectors)`` mapping and works out what changed:
+    the store only appends rows and tombstones ids in place, so new rows are
+    indexed and newly tombstoned rows dropped without touching the rest. A
+    compaction rewrites the row order and triggers a full rebuild.
+
+    Searches run without a lock while ``sync`` may be replacing the index, so
+    state that must agree is swapped in as a single tuple.
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self.state = (np.empty(0, dtype=np.int64), None, np.empty(0, dtype=bool))
+
+    @property
+    def ids(self):
+        return self.state[0]
+
+    def sync(self, ids, vectors):
+        # Copy the ids: the store tombstones rows in place in the mapped file
+        ids = np.array(ids, dtype=np.int64)
+        old_ids, _, old_live = self.state
+        known = len(old_ids)
+        prefix = ids[:known]
+        if known and len(ids) >= known and np.all((prefix == old_ids) | (prefix == TOMBSTONE)):
+            dropped = np.flatnonzero((prefix == TOMBSTONE) & old_live)
+            added = np.arange(known, len(ids))
+            live = np.concatenate([old_live, ids[known:] != TOMBSTONE])
+            live[dropped] = False
+            self._update((ids, vectors, live), added[live[added]], dropped)
+            return
+        self._rebuild((ids, vectors, ids != TOMBSTONE))
+
+    def _update(self, state, added, dropped):
+        self.state = state
+
+    def _rebuild(self, state):
+        self.state = state
+
+    @abstractmethod
+    def search(self, probes, top_k, candidates=None):
+        """Return ``(student_ids, similarities)`` per probe, best first.
+
+        ``candidates`` restricts the search to those student ids.
+        """
+
+    def describe(self):
+        return {'matcher': self.name, 'rows': int(self.state[2].sum())}
+
+    @staticmethod
+    def _eligible(state, candidates):
+        ids, _, live = state
+        if candidates is None:
+            return live
+        return live & np.isin(ids, np.asarray(list(candidates), dtype=np.int64))
+
+    @staticmethod
+    def _top_k(ids, scores, rows, top_k):
+        k = min(top_k, len(rows))
+        if k == 0:
+            return ids[:0], scores[:0]
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return ids[rows[top]], scores[top]
+
+    @classmethod
+    def _exact(cls, state, probes, top_k, eligible):
+        ids, vectors, _ = state
+        if len(ids) == 0:
+            return [(ids[:0], np.empty(0, dtype=np.float32)) for _ in probes]
+        scores = probes @ vectors.T
+        scores[:, ~eligible] = -np.inf
+        rows = np.arange(len(ids))
+        return [cls._top_k(ids, row, rows, top_k) for row in scores]
+
+class ExactMatcher(Matcher):
+    """Brute-force cosine similarity: one matrix multiply over every live row"""
+
+    name = 'exact'
+
+    def search(self, probes, top_k, candidates=None):
+        state = self.state
+        return self._exact(state, probes, top_k, self._eligible(state, candidates))
+
+class IVFMatcher(Matcher):
+    """Inverted-file index: rows are bucketed under the nearest of ``nlist``
+    k-means centroids and a probe only scores the ``nprobe`` closest buckets.
+
+    Recall rises and speed falls with ``nprobe``; ``nprobe == nlist`` is an
+    exact search. Below ``min_train_rows`` live rows the index is not worth
+    training and every search is exact. New rows join their nearest bucket
+    without retraining; the centroids are retrained once the gallery has
+    grown ``retrain_growth`` times past the size they were trained on.
+    """
+
+    name = 'ivf'
+
+    def __init__(self, nlist=None, nprobe=16, min_train_rows=2048, retrain_growth=4.0, iterations=10, seed=0):
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_rows = min_train_rows
+        self.retrain_growth = retrain_growth
+        self.iterations = iterations
+        self.seed = seed
+        # (state, centroids, lists, trained_rows); centroids is None while untrained
+        self.index = (self.state, None, [], 0)
+
+    def _rebuild(self, state):
+        ids, vectors, live = state
+        rows = np.flatnonzero(live)
+        if len(rows) < self.min_train_rows:
+            self.index = (state, None, [], 0)
+            self.state = state
+            return
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(rows))))
+        centroids = self._kmeans(np.asarray(vectors[rows], dtype=np.float32), nlist)
+        labels = self._assign(vectors, centroids, rows)
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(len(centroids) + 1))
+        lists = [rows[order[bounds[i]:bounds[i + 1]]] for i in range(len(centroids))]
+        self.index = (state, centroids, lists, len(rows))
+        self.state = state
+
+    def _update(self, state, added, dropped):
+        _, centroids, lists, trained_rows = self.index
+        live_total = int(state[2].sum())
+        if centroids is None and live_total < self.min_train_rows:
+            self.index = (state, None, [], 0)
+            self.state = state
+            return
+        if centroids is None or live_total > trained_rows * self.retrain_growth:
+            self._rebuild(state)
+            return
+        # Dead rows stay in their bucket and are masked out at search time;
+        # the next compaction rebuilds the lists without them.
+        if len(added):
+            lists = list(lists)
+            labels = self._assign(state[1], centroids, added)
+            for label in np.unique(labels):
+                lists[label] = np.concatenate([lists[label], added[labels == label]])
+        self.index = (state, centroids, lists, trained_rows)
+        self.state = state
+
+    def _kmeans(self, data, nlist):
+        """Spherical k-means on (a sample of) the live rows"""
+        rng = np.random.default_rng(self.seed)
+        sample = data[rng.choice(len(data), min(len(data), nlist * 64), replace=False)]
+        # A configured nlist may exceed the rows available to train on
+        nlist = min(nlist, len(sample))
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            # Reseed empty buckets from random points so no list goes unused
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        return centroids.astype(np.float32)
+
+    @staticmethod
+    def _assign(vectors, centroids, rows, chunk=8192):
+        labels = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), chunk):
+            part = rows[start:start + chunk]
+            labels[start:start + len(part)] = np.argmax(np.asarray(vectors[part]) @ centroids.T, axis=1)
+        return labels
+
+    def search(self, probes, top_k, candidates=None):
+        state, centroids, lists, _ = self.index
+        eligible = self._eligible(state, candidates)
+        if centroids is None or (candidates is not None and eligible.sum() < self.min_train_rows):
+            # Untrained, or a filter already narrows the search to a few rows
+            return self._exact(state, probes, top_k, eligible)
+        ids, vectors, _ = state
+        nprobe = min(self.nprobe, len(centroids))
+        nearest = np.argpartition(-(probes @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for probe, buckets in zip(probes, nearest):
+            rows = np.concatenate([lists[b] for b in buckets])
+            rows = rows[eligible[rows]]
+            scores = np.asarray(vectors[rows]) @ probe if len(rows) else np.empty(0, dtype=np.float32)
+            results.append(self._top_k(ids, scores, rows, top_k))
+        return results
+
+    def describe(self):
+        info = super().describe()
+        centroids = self.index[1]
+        info.update({
+            'trained': centroids is not None,
+            'nlist': 0 if centroids is None else len(centroids),
+            'nprobe': self.nprobe,
+        })
+        return info
+
+MATCHERS = {'exact': ExactMatcher, 'ivf': IVFMatcher}
+
+def make_matcher(name='exact', **options):
+    """Build a matcher by name; options only apply to the approximate matchers"""
+    if name not in MATCHERS:
+        raise ValueError(f"Unknown face matcher '{name}' (expected one of {', '.join(MATCHERS)})")
+    if name == 'exact':
+        return ExactMatcher()
+    return MATCHERS[name](**options)
@@ -0,0 +1,230 @@
+import bisect
+import cProfile
+import glob
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, request
+
+# Histogram bucket upper bounds in seconds, from a cached kiosk frame to a slow batch
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    """Fixed-bucket latency histogram; ``observe`` is a lock, a bisect and three additions"""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    def __init__(self, name, help, callback):
+        self.name, self.help, self.callback = name, help, callback
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+class Metrics:
+    """In-process registry of counters, histograms and gauges served at /metrics.
+
+    Each process keeps its own numbers, so behind several WSGI workers every
+    worker must be scraped (or run a single worker with threads). Optionally
+    one in ``PROFILE_SAMPLE_RATE`` calls of a ``profiled`` function runs under
+    cProfile and its stats are written to ``PROFILE_DIR``.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.profile_every = 0
+        self.profile_dir = 'instance/profiles'
+        self.profile_keep = 100
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._profile_calls = 0
+        self._profiling = threading.Lock()  # cProfile allows one active profiler at a time
+        self.request_seconds = self.histogram('http_request_duration_seconds', 'Request latency by endpoint', ('endpoint', 'method', 'status'))
+        self.stage_seconds = self.histogram('recognition_stage_duration_seconds', 'Time spent in each recognition stage', ('endpoint', 'stage'))
+        self.operation_seconds = self.histogram('face_operation_duration_seconds', 'Latency of face enrollment and search helpers', ('operation', 'outcome'))
+        self.profiles_written = self.counter('profiles_written_total', 'Sampled cProfile dumps written', ('function',))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.setdefault('METRICS_ENABLED', True)
+        self.profile_every = app.config.setdefault('PROFILE_SAMPLE_RATE', 0)
+        self.profile_dir = app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+        self.profile_keep = app.config.setdefault('PROFILE_KEEP', 100)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.extensions['metrics'] = self
+        if self.enabled:
+            app.before_request(self._start_request)
+            app.after_request(self._finish_request)
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, callback):
+        return self._register(Gauge(name, help, callback))
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+
+    def _finish_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is not None and request.endpoint != 'metrics_endpoint':
+            self.request_seconds.observe(time.perf_counter() - started, endpoint=request.endpoint or 'unmatched',
+                                         method=request.method, status=response.status_code)
+        return response
+
+    def observe_stages(self, endpoint, timer):
+        """Record every stage of a ``StageTimer`` under ``endpoint``"""
+        if not self.enabled:
+            return
+        for stage, ms in timer.stages.items():
+            self.stage_seconds.observe(ms / 1000, endpoint=endpoint, stage=stage)
+
+    def timed(self, operation):
+        """Decorator: time a helper that returns a ``{'success': ...}`` dict"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                outcome = 'error'
+                try:
+                    result = fn(*args, **kwargs)
+                    outcome = 'success' if isinstance(result, dict) and result.get('success') else 'failure'
+                    return result
+                finally:
+                    if self.enabled:
+                        self.operation_seconds.observe(time.perf_counter() - start, operation=operation, outcome=outcome)
+            return wrapper
+        return decorator
+
+    def _should_profile(self):
+        if self.profile_every <= 0:
+            return False
+        with self._lock:
+            self._profile_calls += 1
+            return self._profile_calls % self.profile_every == 0
+
+    def profiled(self, fn):
+        """Decorator: run one in ``PROFILE_SAMPLE_RATE`` calls under cProfile"""
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not self._should_profile() or not self._profiling.acquire(blocking=False):
+                return fn(*args, **kwargs)
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    profiler.disable()
+                    self._write_profile(fn.__name__, profiler)
+            finally:
+                self._profiling.release()
+        return wrapper
+
+    def _write_profile(self, name, profiler):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._profile_calls}.prof")
+            profiler.dump_stats(path)
+            self.profiles_written.inc(function=name)
+            for stale in sorted(glob.glob(os.path.join(self.profile_dir, '*.prof')), key=os.path.getmtime)[:-self.profile_keep]:
+                os.remove(stale)
+            if self.app is not None and self.app.logger.isEnabledFor(logging.DEBUG):
+                summary = io.StringIO()
+                pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(15)
+                self.app.logger.debug(f"Profile of {name} written to {path}\n{summary.getvalue()}")
+        except Exception as e:
+            if self.app is not None:
+                self.app.logger.error(f"Failed to write profile for {name}: {str(e)}")
+
+    def render(self):
+        """Prometheus text exposition of every registered metric"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
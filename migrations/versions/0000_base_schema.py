@@ -0,0 +1,84 @@
+"""Base schema: admins, students, attendance records and settings
+
+Revision ID: 0000_base_schema
+Revises:
+Create Date: 2026-10-17 08:00:00
+
+The tables as the application first created them with ``db.create_all()``,
+so ``flask db upgrade`` can build a database from nothing. Tables that
+already exist are left alone; the indexes and constraints added since
+come from the later revisions.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0000_base_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('admin'):
+        op.create_table(
+            'admin',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=80), nullable=False),
+            sa.Column('password_hash', sa.String(length=256), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('username'),
+        )
+    if not inspector.has_table('student'):
+        op.create_table(
+            'student',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('student_id', sa.String(length=20), nullable=False),
+            sa.Column('first_name', sa.String(length=50), nullable=False),
+            sa.Column('last_name', sa.String(length=50), nullable=False),
+            sa.Column('phone', sa.String(length=20), nullable=True),
+            sa.Column('class_name', sa.String(length=20), nullable=False),
+            sa.Column('section', sa.String(length=10), nullable=False),
+            sa.Column('father_name', sa.String(length=100), nullable=True),
+            sa.Column('mother_name', sa.String(length=100), nullable=True),
+            sa.Column('address', sa.Text(), nullable=True),
+            sa.Column('face_encoding_path', sa.String(length=255), nullable=True),
+            sa.Column('photo_path', sa.String(length=255), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('registered_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('student_id'),
+        )
+    if not inspector.has_table('attendance_record'):
+        op.create_table(
+            'attendance_record',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('student_id', sa.Integer(), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+            sa.Column('date', sa.Date(), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('confidence', sa.Float(), nullable=True),
+            sa.Column('photo_path', sa.String(length=255), nullable=True),
+            sa.ForeignKeyConstraint(['student_id'], ['student.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if not inspector.has_table('system_settings'):
+        op.create_table(
+            'system_settings',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('setting_name', sa.String(length=50), nullable=False),
+            sa.Column('setting_value', sa.Text(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('setting_name'),
+        )
+
+
+def downgrade():
+    op.drop_table('system_settings')
+    op.drop_table('attendance_record')
+    op.drop_table('student')
+    op.drop_table('admin')
@@ -0,0 +1,76 @@
+"""Attendance and student indexes, one mark per student per day
+
+Revision ID: 0001_attendance_indexes
+Revises: 0000_base_schema
+Create Date: 2026-10-17 09:00:00
+
+Databases created before this revision were built by ``db.create_all()``
+without these indexes, and stamped every record with the date the server
+process started. This revision repairs those dates from the check-in
+timestamp, drops duplicate marks and adds the indexes. Dropped duplicates
+are logged and copied to ``attendance_record_duplicates`` first. Each step
+checks what already exists so it is safe on databases created by a newer
+``create_all()`` too.
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_attendance_indexes'
+down_revision = '0000_base_schema'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+# Every mark except the first per student and day
+DUPLICATES = (
+    "FROM attendance_record WHERE id NOT IN ("
+    "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM attendance_record GROUP BY student_id, date) AS firsts)"
+)
+
+INDEXES = [
+    ('attendance_record', 'uq_attendance_student_date', ['student_id', 'date'], True),
+    ('attendance_record', 'ix_attendance_record_date_timestamp', ['date', 'timestamp'], False),
+    ('attendance_record', 'ix_attendance_record_timestamp', ['timestamp'], False),
+    ('student', 'ix_student_class_name', ['class_name'], False),
+    ('student', 'ix_student_is_active', ['is_active'], False),
+]
+
+
+def _existing_indexes(table):
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        day_of = "date(timestamp)"
+    else:
+        day_of = "CAST(timestamp AS DATE)"
+    op.execute(
+        f"UPDATE attendance_record SET date = {day_of} "
+        f"WHERE timestamp IS NOT NULL AND (date IS NULL OR date <> {day_of})"
+    )
+    duplicates = bind.execute(sa.text(f"SELECT COUNT(*) {DUPLICATES}")).scalar()
+    if duplicates:
+        if sa.inspect(bind).has_table('attendance_record_duplicates'):
+            op.execute(f"INSERT INTO attendance_record_duplicates SELECT * {DUPLICATES}")
+        else:
+            op.execute(f"CREATE TABLE attendance_record_duplicates AS SELECT * {DUPLICATES}")
+        logger.warning(f"Removing {duplicates} duplicate attendance mark(s); copies kept in attendance_record_duplicates")
+        op.execute(f"DELETE {DUPLICATES}")
+
+    for table, name, columns, unique in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade():
+    for table, name, columns, unique in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,48 @@
+"""Daily attendance rollup per class and section
+
+Revision ID: 0002_daily_attendance_summary
+Revises: 0001_attendance_indexes
+Create Date: 2026-10-17 11:00:00
+
+Creates daily_attendance_summary (unless ``db.create_all()`` already did)
+and fills it from the existing attendance records. ``flask
+rebuild-summaries`` performs the same backfill on demand.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_daily_attendance_summary'
+down_revision = '0001_attendance_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'daily_attendance_summary' not in inspector.get_table_names():
+        op.create_table(
+            'daily_attendance_summary',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('class_name', sa.String(length=20), nullable=False),
+            sa.Column('section', sa.String(length=10), nullable=False),
+            sa.Column('present_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('date', 'class_name', 'section', name='uq_daily_summary_date_class_section'),
+        )
+        op.create_index('ix_daily_attendance_summary_date', 'daily_attendance_summary', ['date'], unique=False)
+
+    op.execute("DELETE FROM daily_attendance_summary")
+    op.execute(
+        "INSERT INTO daily_attendance_summary (date, class_name, section, present_count) "
+        "SELECT a.date, COALESCE(s.class_name, ''), COALESCE(s.section, ''), COUNT(a.id) "
+        "FROM attendance_record a JOIN student s ON s.id = a.student_id "
+        "GROUP BY a.date, s.class_name, s.section"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_daily_attendance_summary_date', table_name='daily_attendance_summary')
+    op.drop_table('daily_attendance_summary')
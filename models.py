@@ -1,5 +1,5 @@
 from app import db
-from datetime import datetime
+from datetime import datetime, date
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class Admin(db.Model):
@@ -20,14 +20,14 @@ class Student(db.Model):
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     phone = db.Column(db.String(20))
-    class_name = db.Column(db.String(20), nullable=False)
+    class_name = db.Column(db.String(20), nullable=False, index=True)
     section = db.Column(db.String(10), nullable=False)
     father_name = db.Column(db.String(100))
     mother_name = db.Column(db.String(100))
     address = db.Column(db.Text)
     face_encoding_path = db.Column(db.String(255))
     photo_path = db.Column(db.String(255))
-    is_active = db.Column(db.Boolean, default=True)
+    is_active = db.Column(db.Boolean, default=True, index=True)
     registered_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     attendance_records = db.relationship('AttendanceRecord', backref='student', lazy=True)
@@ -37,10 +37,18 @@ class Student(db.Model):
         return f"{self.first_name} {self.last_name}"
 
 class AttendanceRecord(db.Model):
+    __table_args__ = (
+        # One mark per student per day, enforced across every worker process
+        db.Index('uq_attendance_student_date', 'student_id', 'date', unique=True),
+        # Per-day register and counts filter on date and order by check-in time
+        db.Index('ix_attendance_record_date_timestamp', 'date', 'timestamp'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.now)
-    date = db.Column(db.Date, default=datetime.now().date)
+    timestamp = db.Column(db.DateTime, default=datetime.now, index=True)
+    # Callable default so every insert gets the current day, not the import day
+    date = db.Column(db.Date, default=date.today)
     status = db.Column(db.String(20), default='present')
     confidence = db.Column(db.Float)
     photo_path = db.Column(db.String(255))
@@ -52,4 +60,19 @@ class SystemSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     setting_name = db.Column(db.String(50), unique=True, nullable=False)
     setting_value = db.Column(db.Text)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DailyAttendanceSummary(db.Model):
+    """Present count per day per class/section, maintained as attendance is written"""
+    __table_args__ = (
+        db.UniqueConstraint('date', 'class_name', 'section', name='uq_daily_summary_date_class_section'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+    class_name = db.Column(db.String(20), nullable=False)
+    section = db.Column(db.String(10), nullable=False)
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyAttendanceSummary {self.date} {self.class_name}-{self.section}: {self.present_count}>'
@@ -0,0 +1,71 @@
+import threading
+from datetime import date
+from app import db
+from models import AttendanceRecord
+
+class PresenceRegistry:
+    """In-memory set of students already marked present today.
+
+    Warmed from the database the first time it is used each day and rolled
+    over when the date changes, so repeat recognitions can be answered
+    without a query. The unique ``(student_id, date)`` index on
+    ``AttendanceRecord`` remains the source of truth across workers.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._day = None
+        self._present = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['presence'] = self
+
+    def _current(self, day):
+        # Caller holds the lock
+        if day != self._day:
+            with self.app.app_context():
+                rows = db.session.query(AttendanceRecord.student_id).filter(AttendanceRecord.date == day).all()
+            self._present = {row.student_id for row in rows}
+            self._day = day
+        return self._present
+
+    def warm(self):
+        """Load today's marks now rather than on the first recognition"""
+        with self._lock:
+            self._day = None
+            self._current(date.today())
+
+    def is_present(self, student_id):
+        with self._lock:
+            return student_id in self._current(date.today())
+
+    def mark(self, student_id, day=None):
+        """Record a student as present; returns False if they already were"""
+        day = day or date.today()
+        with self._lock:
+            if day != date.today():
+                # Back-dated marks are left to the database constraint
+                return True
+            present = self._current(day)
+            if student_id in present:
+                return False
+            present.add(student_id)
+            return True
+
+    def discard(self, student_id, day=None):
+        """Forget a mark that could not be persisted"""
+        day = day or date.today()
+        with self._lock:
+            if day == self._day:
+                self._present.discard(student_id)
+
+    def reset(self):
+        with self._lock:
+            self._day = None
+            self._present = set()
+
+presence = PresenceRegistry()
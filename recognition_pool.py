@@ -0,0 +1,138 @@
+import atexit
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+class PoolOverloaded(Exception):
+    """Raised instead of queueing when the recognition pool is full"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Recognition pool busy; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class StageTimer:
+    """Accumulates wall-clock milliseconds per named stage of one request"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def as_dict(self):
+        return {name: round(ms, 2) for name, ms in self.stages.items()}
+
+    def server_timing(self):
+        """Value for a ``Server-Timing`` response header"""
+        return ', '.join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
+
+class RecognitionPool:
+    """Dedicated executor for CPU-bound recognition work.
+
+    Frame decoding, Haar detection and the gallery matmul all release the GIL
+    inside OpenCV/NumPy, so a thread pool scales across cores while sharing
+    the in-process gallery, trackers and presence set. Web threads only wait
+    on the result; at most ``RECOGNITION_QUEUE`` jobs may be running or
+    waiting, and beyond that ``run`` raises ``PoolOverloaded`` straight away
+    so the caller can answer 429 instead of tying up a web thread.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = os.cpu_count() or 2
+        self.max_queue = self.workers * 4
+        self.timeout = 10.0
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._avg_seconds = 0.05  # moving average of job run time, for Retry-After
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.setdefault('RECOGNITION_WORKERS', os.cpu_count() or 2)
+        self.max_queue = app.config.setdefault('RECOGNITION_QUEUE', self.workers * 4)
+        self.timeout = app.config.setdefault('RECOGNITION_TIMEOUT', 10.0)
+        app.extensions['recognition_pool'] = self
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        # Pools do not survive fork(), so each worker process creates its own
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._pending = 0
+                    self._slots = threading.BoundedSemaphore(self.max_queue)
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='recognition')
+
+    def retry_after(self):
+        """Seconds a rejected client should wait: the time to drain the current queue"""
+        with self._lock:
+            pending, avg = self._pending, self._avg_seconds
+        return max(1, math.ceil(pending * avg / max(self.workers, 1)))
+
+    def _call(self, fn, args, kwargs, timer, queued_at):
+        started = time.perf_counter()
+        if timer is not None:
+            timer.add('queue', (started - queued_at) * 1000)
+        try:
+            if timer is not None:
+                kwargs['timer'] = timer
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._pending -= 1
+                self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * elapsed
+            self._slots.release()
+
+    def run(self, fn, *args, timer=None, **kwargs):
+        """Run ``fn`` on the pool and wait for its result.
+
+        ``timer`` records the time spent queued and is passed on to ``fn``.
+        Raises ``PoolOverloaded`` when the queue is full or the job does not
+        finish within ``RECOGNITION_TIMEOUT`` seconds.
+        """
+        self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            raise PoolOverloaded(self.retry_after())
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._call, fn, args, kwargs, timer, time.perf_counter())
+        except RuntimeError:  # shut down at interpreter exit
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            raise PoolOverloaded(self.retry_after())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PoolOverloaded(self.retry_after())
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'queue_limit': self.max_queue, 'pending': self._pending,
+                    'avg_job_ms': round(self._avg_seconds * 1000, 2)}
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+recognition_pool = RecognitionPool()
@@ -1,15 +1,27 @@
-from flask import render_template, request, redirect, url_for, flash, session, jsonify, send_file
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response, stream_with_context
 from app import app, db
-from models import Admin, Student, AttendanceRecord, SystemSettings
-from utils import save_face_encoding, save_face_encoding_from_data, recognize_face, generate_id_card, allowed_file, search_student_by_image
+from models import Admin, Student, AttendanceRecord, DailyAttendanceSummary
+from utils import save_face_encoding_from_data, recognize_face, recognize_faces, render_id_cards, id_card_sheet, search_student_by_image, decode_image_bytes, DECODE_SCALES
+from face_gallery import gallery
+from face_detection import get_tracker, MIN_FACE_SIZE
+from attendance_writer import attendance_writer
+from presence import presence
+from kiosk_sessions import kiosk_sessions
+from recognition_pool import recognition_pool, PoolOverloaded, StageTimer
+from metrics import metrics
+from summaries import summary_deltas, apply_summary_deltas
+from student_search import search_students, PAGE_SIZE
+from export import attendance_rows, iter_csv, iter_parquet, parquet_available
+from enrollment import extract_photos, new_import_workdir, start_import_job, get_import_job
+from image_pipeline import remove_photo
+import hmac
 import os
-import cv2
-import numpy as np
-from datetime import datetime, date
+import shutil
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import joinedload
 import base64
 from io import BytesIO
-from PIL import Image
-import json
 
 @app.route('/')
 def index():
@@ -47,7 +59,9 @@ def dashboard():
     
     # Get statistics
     total_students = Student.query.count()
-    today_attendance = AttendanceRecord.query.filter_by(date=date.today()).count()
+    today_attendance = db.session.query(
+        func.coalesce(func.sum(DailyAttendanceSummary.present_count), 0)
+    ).filter(DailyAttendanceSummary.date == date.today()).scalar()
     active_students = Student.query.filter_by(is_active=True).count()
     
     # Get recent attendance records
@@ -126,23 +140,82 @@ def register_student():
     
     return render_template('register_student.html')
 
+@app.route('/api/students/bulk_import', methods=['POST'])
+def bulk_import_students():
+    """Start enrolling students from an uploaded roster CSV and a zip of photos"""
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+    # Photo archives are far larger than the app-wide upload limit allows
+    request.max_content_length = app.config['BULK_IMPORT_MAX_UPLOAD']
+    roster = request.files.get('roster')
+    photos = request.files.get('photos')
+    if not roster or not photos:
+        return jsonify({'success': False, 'message': 'Upload a roster CSV and a zip of photos'}), 400
+    workdir = new_import_workdir(app.config['BULK_IMPORT_DIR'])
+    photo_dir = os.path.join(workdir, 'photos')
+    os.makedirs(photo_dir)
+    roster_path = os.path.join(workdir, 'roster.csv')
+    roster.save(roster_path)
+    try:
+        extracted = extract_photos(photos.stream, photo_dir)
+    except Exception as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        return jsonify({'success': False, 'message': f'Could not read photo archive: {str(e)}'}), 400
+    job = start_import_job(app, workdir, roster_path, photo_dir,
+                           batch_size=request.form.get('batch_size', 200, type=int))
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'photos': extracted,
+        'status_url': url_for('bulk_import_status', job_id=job.id),
+    }), 202
+
+@app.route('/api/students/bulk_import/<job_id>')
+def bulk_import_status(job_id):
+    """Progress and per-row errors of a bulk import; ?format=csv downloads the full report"""
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+    job = get_import_job(app.config['BULK_IMPORT_DIR'], job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown import job'}), 404
+    if request.args.get('format') == 'csv':
+        return send_file(job.report_path, mimetype='text/csv', as_attachment=True,
+                         download_name=f'import_report_{job.id}.csv')
+    return jsonify({'success': True, **job.to_dict()})
+
 @app.route('/manage_students')
 def manage_students():
     if 'admin_id' not in session:
         return redirect(url_for('login'))
     
     search = request.args.get('search', '')
-    if search:
-        students = Student.query.filter(
-            (Student.first_name.contains(search)) |
-            (Student.last_name.contains(search)) |
-            (Student.student_id.contains(search)) |
-            (Student.class_name.contains(search))
-        ).all()
-    else:
-        students = Student.query.all()
+    after = request.args.get('after', type=int)
+    students, next_cursor = search_students(search, after=after)
+    class_options = db.session.query(Student.class_name, Student.section).filter(Student.is_active == True).distinct().order_by(Student.class_name, Student.section).all()
     
-    return render_template('manage_students.html', students=students, search=search)
+    return render_template('manage_students.html', students=students, search=search,
+                           next_cursor=next_cursor, is_first_page=not after, class_options=class_options)
+
+@app.route('/api/students/search')
+def api_search_students():
+    """Keyset-paginated student search for admin pages"""
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+    limit = min(request.args.get('limit', PAGE_SIZE, type=int), 200)
+    students, next_cursor = search_students(request.args.get('q', ''), after=request.args.get('after', type=int), limit=limit)
+    return jsonify({
+        'success': True,
+        'students': [{
+            'id': student.id,
+            'student_id': student.student_id,
+            'name': student.full_name,
+            'class_name': student.class_name,
+            'section': student.section,
+            'is_active': student.is_active,
+            'photo_path': student.photo_path,
+        } for student in students],
+        'next_cursor': next_cursor,
+    })
 
 @app.route('/attendance_register')
 def attendance_register():
@@ -158,12 +231,72 @@ def attendance_register():
     except:
         filter_date_obj = date.today()
     
-    # Get attendance records for the selected date
-    attendance_records = AttendanceRecord.query.filter_by(date=filter_date_obj).order_by(AttendanceRecord.timestamp.desc()).all()
+    # Keyset cursor "<timestamp>,<id>" of the last row on the previous page
+    query = AttendanceRecord.query.options(joinedload(AttendanceRecord.student)).filter_by(date=filter_date_obj)
+    after = request.args.get('after', '')
+    if after:
+        try:
+            after_ts, after_id = after.rsplit(',', 1)
+            after_ts, after_id = datetime.fromisoformat(after_ts), int(after_id)
+            query = query.filter(or_(
+                AttendanceRecord.timestamp < after_ts,
+                and_(AttendanceRecord.timestamp == after_ts, AttendanceRecord.id < after_id)
+            ))
+        except ValueError:
+            after = ''
+    
+    # Get one page of attendance records for the selected date, students loaded in the same query
+    attendance_records = query.order_by(AttendanceRecord.timestamp.desc(), AttendanceRecord.id.desc()).limit(PAGE_SIZE + 1).all()
+    next_cursor = None
+    if len(attendance_records) > PAGE_SIZE:
+        last = attendance_records[PAGE_SIZE - 1]
+        next_cursor = f"{last.timestamp.isoformat()},{last.id}"
+        attendance_records = attendance_records[:PAGE_SIZE]
+    
+    checked_in = db.session.query(
+        func.coalesce(func.sum(DailyAttendanceSummary.present_count), 0)
+    ).filter(DailyAttendanceSummary.date == filter_date_obj).scalar()
     
     return render_template('attendance_register.html', 
                          attendance_records=attendance_records,
-                         filter_date=filter_date)
+                         filter_date=filter_date,
+                         checked_in=checked_in,
+                         next_cursor=next_cursor,
+                         is_first_page=not after)
+
+def _parse_date_arg(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+@app.route('/export/attendance')
+def export_attendance():
+    """Stream attendance for a date range as CSV or Parquet"""
+    if 'admin_id' not in session:
+        return redirect(url_for('login'))
+    
+    try:
+        end_date = _parse_date_arg('end', date.today())
+        start_date = _parse_date_arg('start', end_date)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'}), 400
+    export_format = request.args.get('format', 'csv')
+    class_name = request.args.get('class_name') or None
+    section = request.args.get('section') or None
+    
+    rows = attendance_rows(start_date, end_date, class_name=class_name, section=section)
+    filename = f"attendance_{start_date.isoformat()}_{end_date.isoformat()}"
+    if export_format == 'parquet':
+        if not parquet_available():
+            return jsonify({'success': False, 'message': 'Parquet export requires pyarrow to be installed'}), 501
+        body, mimetype, filename = iter_parquet(rows), 'application/vnd.apache.parquet', filename + '.parquet'
+    elif export_format == 'csv':
+        body, mimetype, filename = iter_csv(rows), 'text/csv', filename + '.csv'
+    else:
+        return jsonify({'success': False, 'message': 'Unsupported export format'}), 400
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 @app.route('/statistics')
 def statistics():
@@ -171,19 +304,16 @@ def statistics():
         return redirect(url_for('login'))
     
     # Get attendance statistics for the last 7 days
-    from datetime import timedelta
-    from sqlalchemy import func
-    
     end_date = date.today()
     start_date = end_date - timedelta(days=6)
     
-    # Daily attendance count for the last 7 days
+    # Daily attendance count for the last 7 days, from the rollup table
     daily_stats = db.session.query(
-        AttendanceRecord.date,
-        func.count(AttendanceRecord.id).label('count')
+        DailyAttendanceSummary.date,
+        func.sum(DailyAttendanceSummary.present_count).label('count')
     ).filter(
-        AttendanceRecord.date >= start_date
-    ).group_by(AttendanceRecord.date).all()
+        DailyAttendanceSummary.date >= start_date
+    ).group_by(DailyAttendanceSummary.date).order_by(DailyAttendanceSummary.date).all()
     
     # Class-wise statistics
     course_stats = db.session.query(
@@ -200,76 +330,296 @@ def client():
     """Raspberry Pi client interface"""
     return render_template('client.html')
 
+def kiosk_key():
+    """Identify the calling kiosk so per-camera state can be kept"""
+    # Browsers cannot set headers on a WebSocket, so streams pass ?kiosk= instead
+    return request.headers.get('X-Kiosk-Id') or request.args.get('kiosk') or request.remote_addr
+
+RECOGNITION_OUTCOMES = metrics.counter('recognition_requests_total', 'Kiosk recognition responses by endpoint and outcome', ('endpoint', 'outcome'))
+metrics.gauge('recognition_pool_pending', 'Recognition jobs running or waiting', lambda: recognition_pool.stats()['pending'])
+metrics.gauge('attendance_writer_backlog', 'Attendance events waiting to be committed', lambda: attendance_writer.backlog())
+metrics.gauge('face_gallery_size', 'Enrolled face embeddings in memory', lambda: len(gallery))
+
+# Non-success messages that get their own outcome label; anything else counts as unrecognized
+FAILURE_OUTCOMES = {'No face detected': 'no_face', 'Invalid image data': 'invalid', 'Recognition failed': 'error'}
+
+def record_recognition(endpoint, payload, timer=None):
+    """Count a kiosk response by outcome and record its stage timings"""
+    if timer is not None:
+        metrics.observe_stages(endpoint, timer)
+    if payload.get('duplicate'):
+        outcome = 'duplicate'
+    elif 'retry_after' in payload:
+        outcome = 'overloaded'
+    elif 'faces' in payload:
+        outcome = 'batch'
+    elif payload.get('success'):
+        outcome = 'already_marked' if payload.get('already_marked') else 'marked'
+    else:
+        outcome = FAILURE_OUTCOMES.get(payload.get('message'), 'unrecognized')
+    RECOGNITION_OUTCOMES.inc(endpoint=endpoint, outcome=outcome)
+
+ALREADY_MARKED = {'success': True, 'message': '', 'student_name': '', 'student_id': '', 'already_marked': True}
+
+def kiosk_result(kiosk, response, student_id=None, marked=False):
+    """Response for a kiosk frame, recorded in its session when dedup is on"""
+    if kiosk is None:
+        return response
+    # Duplicates of a recognized frame must not repeat the welcome message
+    repeat = ALREADY_MARKED if student_id is not None else None
+    return kiosk_sessions.record(kiosk, response, student_id=student_id, marked=marked, repeat=repeat)
+
+def kiosk_session_for(image_bytes):
+    """Return ``(session, cached_response)``; the cached response is set when the frame is a repeat"""
+    if not app.config['KIOSK_DEDUP']:
+        return None, None
+    kiosk = kiosk_sessions.get(kiosk_key())
+    # A 1/8-scale decode costs a fraction of the full one and is plenty for the hash
+    thumbnail = decode_image_bytes(image_bytes, scale=8, grayscale=True)
+    if thumbnail is None:
+        return kiosk, None
+    return kiosk, kiosk_sessions.check_frame(kiosk, thumbnail)
+
+def decode_kiosk_frame(image_bytes, scale=1):
+    """Decode a binary kiosk frame to grayscale; returns ``(image, min_face_size)``"""
+    image_array = decode_image_bytes(image_bytes, scale=scale, grayscale=True)
+    # Reduced decodes shrink faces too, so the detector's minimum size shrinks with them
+    min_face_size = tuple(max(v // scale, 20) for v in MIN_FACE_SIZE) if scale in DECODE_SCALES else None
+    return image_array, min_face_size
+
+@metrics.profiled
+def recognize_kiosk_frame(image_bytes, scale=1, tracker=None, timer=None):
+    """Recognition pool job: decode a binary frame and recognize its largest face; None if undecodable"""
+    with timer.stage('decode'):
+        image_array, min_face_size = decode_kiosk_frame(image_bytes, scale)
+    if image_array is None:
+        return None
+    return recognize_face(image_array, tracker=tracker, min_face_size=min_face_size, timer=timer)
+
+@metrics.profiled
+def recognize_data_url_frame(image_data, tracker=None, timer=None):
+    """Recognition pool job for the legacy JSON endpoint's PIL-decoded frames"""
+    import cv2
+    import numpy as np
+    from PIL import Image
+    with timer.stage('decode'):
+        image_array = np.array(Image.open(BytesIO(image_data)))
+    if len(image_array.shape) == 3:
+        with timer.stage('convert'):
+            image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+    return recognize_face(image_array, tracker=tracker, timer=timer)
+
+def mark_recognized(result, kiosk=None, timer=None):
+    """Queue the attendance mark for a recognition result; returns the kiosk response dict"""
+    timer = timer or StageTimer()
+    if result['success']:
+        student_id = result['student_id']
+        if (kiosk is not None and kiosk_sessions.recently_recognized(kiosk, student_id)) or presence.is_present(student_id):
+            # Suppress all feedback if already marked
+            return kiosk_result(kiosk, ALREADY_MARKED, student_id)
+        with timer.stage('lookup'):
+            student = Student.query.get(student_id)
+        if student:
+            # Written asynchronously; the kiosk does not wait on the database
+            with timer.stage('enqueue'):
+                queued = attendance_writer.submit(student.id, result['confidence'])
+            if queued:
+                return kiosk_result(kiosk, {'success': True, 'message': f'Welcome {student.full_name}! Attendance marked.', 'student_name': student.full_name, 'student_id': student.student_id, 'already_marked': False}, student_id, marked=True)
+            else:
+                # Suppress all feedback if already marked
+                return kiosk_result(kiosk, ALREADY_MARKED, student_id)
+    return kiosk_result(kiosk, {'success': False, 'message': 'Face not recognized'})
+
+def kiosk_tracker():
+    return get_tracker(kiosk_key()) if app.config['FACE_TRACKING'] else None
+
+def overloaded_response(error):
+    """429 telling the kiosk when to try again"""
+    payload = {'success': False, 'message': 'Server busy, please retry', 'retry_after': error.retry_after, 'next_capture_ms': error.retry_after * 1000}
+    record_recognition(request.endpoint, payload)
+    response = jsonify(payload)
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def timed_response(payload, timer, status=200):
+    record_recognition(request.endpoint, payload, timer)
+    response = jsonify(payload)
+    response.status_code = status
+    response.headers['Server-Timing'] = timer.server_timing()
+    return response
+
 @app.route('/api/recognize_face', methods=['POST'])
 def api_recognize_face():
+    """Recognize a base64 data-URL frame posted as JSON (legacy clients)"""
     try:
         data = request.get_json()
         if not data or 'image' not in data:
             return jsonify({'success': False, 'message': 'No image data provided'})
         image_data = base64.b64decode(data['image'].split(',')[1])
-        image = Image.open(BytesIO(image_data))
-        image_array = np.array(image)
-        if len(image_array.shape) == 3:
-            image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
-        result = recognize_face(image_array)
-        if result['success']:
-            student = Student.query.get(result['student_id'])
-            if student:
-                today_record = AttendanceRecord.query.filter_by(student_id=student.id, date=date.today()).first()
-                if not today_record:
-                    attendance = AttendanceRecord(student_id=student.id, confidence=result['confidence'])
-                    db.session.add(attendance)
-                    db.session.commit()
-                    # Delete attendance photo after marking
-                    if hasattr(attendance, 'photo_path') and attendance.photo_path:
-                        import os
-                        try:
-                            if os.path.exists(attendance.photo_path):
-                                os.remove(attendance.photo_path)
-                                attendance.photo_path = None
-                                db.session.commit()
-                        except Exception as e:
-                            app.logger.error(f"Failed to delete attendance photo: {str(e)}")
-                    return jsonify({'success': True, 'message': f'Welcome {student.full_name}! Attendance marked.', 'student_name': student.full_name, 'student_id': student.student_id, 'already_marked': False})
-                else:
-                    # Suppress all feedback if already marked
-                    return jsonify({'success': True, 'message': '', 'student_name': '', 'student_id': '', 'already_marked': True})
-        return jsonify({'success': False, 'message': 'Face not recognized'})
+        kiosk, cached = kiosk_session_for(image_data)
+        if cached:
+            record_recognition(request.endpoint, cached)
+            return jsonify(cached)
+        timer = StageTimer()
+        result = recognition_pool.run(recognize_data_url_frame, image_data, tracker=kiosk_tracker(), timer=timer)
+        payload = mark_recognized(result, kiosk, timer)
+        return timed_response(payload, timer)
+    except PoolOverloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        app.logger.error(f"Face recognition error: {str(e)}")
+        record_recognition(request.endpoint, {'success': False, 'message': 'Recognition failed'})
+        return jsonify({'success': False, 'message': 'Recognition failed'})
+
+@app.route('/api/recognize_face/frame', methods=['POST'])
+def api_recognize_frame():
+    """Recognize a raw JPEG/PNG frame sent as the request body or a multipart ``image`` field.
+
+    ``?scale=2|4|8`` decodes the frame at reduced resolution. Frames that
+    match the kiosk's previous one are answered from its session without
+    recognition; every response suggests a ``next_capture_ms``. When the
+    recognition pool is full the answer is 429 with ``Retry-After``.
+    """
+    try:
+        if request.files.get('image'):
+            image_bytes = request.files['image'].read()
+        else:
+            image_bytes = request.get_data(cache=False)
+        if not image_bytes:
+            return jsonify({'success': False, 'message': 'No image data provided'})
+        kiosk, cached = kiosk_session_for(image_bytes)
+        if cached:
+            record_recognition(request.endpoint, cached)
+            return jsonify(cached)
+        scale = request.args.get('scale', app.config['FRAME_DECODE_SCALE'], type=int)
+        timer = StageTimer()
+        result = recognition_pool.run(recognize_kiosk_frame, image_bytes, scale, tracker=kiosk_tracker(), timer=timer)
+        if result is None:
+            return timed_response({'success': False, 'message': 'Invalid image data'}, timer, 400)
+        payload = mark_recognized(result, kiosk, timer)
+        return timed_response(payload, timer)
+    except PoolOverloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         app.logger.error(f"Face recognition error: {str(e)}")
+        record_recognition(request.endpoint, {'success': False, 'message': 'Recognition failed'})
+        return jsonify({'success': False, 'message': 'Recognition failed'})
+
+@metrics.profiled
+def recognize_batch_frames(frames, timer=None):
+    """Recognition pool job: decode every frame and recognize all faces; None if any frame is undecodable"""
+    with timer.stage('decode'):
+        images = [decode_image_bytes(frame, grayscale=True) for frame in frames]
+    if any(image is None for image in images):
+        return None
+    with timer.stage('recognize'):
+        return recognize_faces(images)
+
+def _batch_frames():
+    """Collect encoded frames from multipart files, a JSON list of data URLs or a raw body"""
+    files = request.files.getlist('images') or request.files.getlist('image')
+    if files:
+        return [f.read() for f in files]
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        return [base64.b64decode(item.split(',', 1)[-1]) for item in data.get('images', [])]
+    body = request.get_data(cache=False)
+    return [body] if body else []
+
+@app.route('/api/recognize_batch', methods=['POST'])
+def api_recognize_batch():
+    """Recognize every face in a classroom snapshot (or several frames) and mark them all present"""
+    try:
+        frames = _batch_frames()
+        if not frames:
+            return jsonify({'success': False, 'message': 'No image data provided'})
+        if len(frames) > app.config['BATCH_MAX_FRAMES']:
+            return jsonify({'success': False, 'message': f"At most {app.config['BATCH_MAX_FRAMES']} frames per request"}), 413
+        timer = StageTimer()
+        faces = recognition_pool.run(recognize_batch_frames, frames, timer=timer)
+        if faces is None:
+            return jsonify({'success': False, 'message': 'Invalid image data'}), 400
+        
+        matched_ids = {face['student_id'] for face in faces if face['success']}
+        with timer.stage('lookup'):
+            students = {s.id: s for s in Student.query.filter(Student.id.in_(matched_ids)).all()} if matched_ids else {}
+        
+        # Queued for the write-behind worker, which inserts them in one transaction
+        marked = 0
+        with timer.stage('enqueue'):
+            for face in faces:
+                student = students.get(face.get('student_id')) if face['success'] else None
+                if student is None:
+                    face['success'] = False
+                    face.pop('student_id', None)
+                    continue
+                face['student_name'] = student.full_name
+                face['student_id'] = student.student_id
+                face['already_marked'] = not attendance_writer.submit(student.id, face['confidence'])
+                if not face['already_marked']:
+                    marked += 1
+        
+        return timed_response({
+            'success': True,
+            'faces': faces,
+            'faces_detected': len(faces),
+            'marked': marked,
+            'message': f'{marked} student(s) marked present'
+        }, timer)
+    except PoolOverloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        app.logger.error(f"Batch recognition error: {str(e)}")
         return jsonify({'success': False, 'message': 'Recognition failed'})
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape target; requires ``Authorization: Bearer <METRICS_TOKEN>`` when a token is configured"""
+    token = app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    if not metrics.enabled:
+        return Response('Metrics disabled\n', status=404, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/search_by_image', methods=['GET', 'POST'])
 def search_by_image():
     """Search for student ID card using uploaded image"""
     if 'admin_id' not in session:
         return redirect(url_for('login'))
     
+    class_options = db.session.query(Student.class_name, Student.section).filter(Student.is_active == True).distinct().order_by(Student.class_name, Student.section).all()
+    filters = {'class_name': request.form.get('class_name', ''), 'section': request.form.get('section', '')}
     if request.method == 'GET':
-        return render_template('search_by_image.html')
+        return render_template('search_by_image.html', class_options=class_options, filters=filters)
     
     try:
         # Get image data from form
         face_image_data = request.form.get('face_image_data')
         if not face_image_data:
             flash('No image captured. Please capture an image.', 'error')
-            return render_template('search_by_image.html')
+            return render_template('search_by_image.html', class_options=class_options, filters=filters)
         
-        # Process image and search for matching student
-        result = search_student_by_image(face_image_data)
+        # Process image and rank matching students
+        result = search_student_by_image(face_image_data, class_name=filters['class_name'] or None, section=filters['section'] or None)
         
-        if result['success'] and result['student']:
+        if result['success']:
             student = result['student']
-            flash(f'Student found: {student.full_name} (ID: {student.student_id})', 'success')
-            return render_template('search_by_image.html', student=student)
+            if student:
+                flash(f'Student found: {student.full_name} (ID: {student.student_id})', 'success')
+            else:
+                flash('No confident match; showing the closest students.', 'warning')
+            return render_template('search_by_image.html', student=student, candidates=result['candidates'],
+                                   class_options=class_options, filters=filters)
         else:
             flash(result.get('message', 'No matching student found.'), 'warning')
-            return render_template('search_by_image.html')
+            return render_template('search_by_image.html', class_options=class_options, filters=filters)
             
     except Exception as e:
         app.logger.error(f"Error in image search: {str(e)}")
         flash('Error processing image. Please try again.', 'error')
-        return render_template('search_by_image.html')
+        return render_template('search_by_image.html', class_options=class_options, filters=filters)
 
 @app.route('/generate_id_card/<int:student_id>')
 def generate_student_id_card(student_id):
@@ -277,40 +627,69 @@ def generate_student_id_card(student_id):
         return redirect(url_for('login'))
     
     student = Student.query.get_or_404(student_id)
+    if request.args.get('format') == 'png':
+        (card_path,), _ = render_id_cards([student])
+        return send_file(card_path, mimetype='image/png', as_attachment=True,
+                         download_name=f"id_card_{student.student_id}.png")
     return render_template('id_card.html', student=student)
 
+@app.route('/id_cards')
+def print_id_cards():
+    """Print sheet of ID cards for a class/section (or every active student)"""
+    if 'admin_id' not in session:
+        return redirect(url_for('login'))
+    
+    class_name = request.args.get('class_name', '')
+    section = request.args.get('section', '')
+    fmt = 'png' if request.args.get('format') == 'png' else 'pdf'
+    try:
+        sheet = id_card_sheet(class_name, section, fmt)
+    except Exception as e:
+        app.logger.error(f"Error rendering ID cards: {str(e)}")
+        flash('Error generating ID cards. Please try again.', 'error')
+        return redirect(url_for('manage_students'))
+    if sheet is None:
+        flash('No active students match the selected class and section.', 'error')
+        return redirect(url_for('manage_students'))
+    
+    sheet_path, download_name, cards, rendered = sheet
+    app.logger.info(f"ID cards {download_name}: {cards} cards, {rendered} rendered")
+    return send_file(sheet_path, mimetype='application/pdf' if fmt == 'pdf' else 'image/png',
+                     as_attachment=True, download_name=download_name)
+
 @app.route('/delete_student/<int:student_id>')
 def delete_student(student_id):
     if 'admin_id' not in session:
         return redirect(url_for('login'))
     
     student = Student.query.get_or_404(student_id)
+    photo_path = student.photo_path
+    encoding_path = student.face_encoding_path
     
-    # Delete associated files
-    if student.face_encoding_path and os.path.exists(student.face_encoding_path):
-        os.remove(student.face_encoding_path)
-    if student.photo_path and os.path.exists(student.photo_path):
-        os.remove(student.photo_path)
-    
-    # Delete attendance records
+    # Delete attendance records and take them out of the daily rollup
+    marks = db.session.query(AttendanceRecord.student_id, AttendanceRecord.date).filter_by(student_id=student.id).all()
+    apply_summary_deltas(summary_deltas(marks, sign=-1))
     AttendanceRecord.query.filter_by(student_id=student.id).delete()
     
     # Delete student
     db.session.delete(student)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error deleting student {student_id}: {str(e)}")
+        flash('Error deleting student. Please try again.', 'error')
+        return redirect(url_for('manage_students'))
+    
+    # Only once the row is gone: a failed delete must leave the student recognizable.
+    # Marks still queued in the attendance writer are dropped there.
+    gallery.remove(student_id)
+    presence.discard(student_id)
+    # Legacy per-student pickle; the shared embedding store must never be removed here
+    if encoding_path and encoding_path.endswith('.pkl') and os.path.exists(encoding_path):
+        os.remove(encoding_path)
+    if photo_path:
+        remove_photo(os.path.join('static', photo_path))
     
     flash('Student deleted successfully!', 'success')
     return redirect(url_for('manage_students'))
-
-# Initialize default admin user
-def create_default_admin():
-    with app.app_context():
-        if not Admin.query.first():
-            admin = Admin(username='admin')
-            admin.set_password('admin123')
-            db.session.add(admin)
-            db.session.commit()
-            print("Default admin created: username='admin', password='admin123'")
-
-# Call the function to create default admin
-create_default_admin()
\ No newline at end of file
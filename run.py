@@ -2,7 +2,16 @@
 Face Recognition Attendance System
 Run this file to start the application
 """
+import os
+
 if __name__ == '__main__':
-    from app import app
+    # waitress cannot hand a connection over to a WebSocket, so kiosks upload frames over HTTP here;
+    # serve with gunicorn (threads) or the dev server to use KIOSK_STREAM
+    os.environ['KIOSK_STREAM'] = '0'
+    from main import app
+    from commands import init_database
     from waitress import serve
-    serve(app, host='192.168.1.34', port=8000)
\ No newline at end of file
+    with app.app_context():
+        init_database()
+    # waitress refuses bodies over 1 GiB by default, which bulk photo imports can exceed
+    serve(app, host='192.168.1.34', port=8000, max_request_body_size=app.config['BULK_IMPORT_MAX_UPLOAD'])
\ No newline at end of file
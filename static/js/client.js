@@ -1,15 +1,175 @@
 // Client-side JavaScript for Raspberry Pi interface
 
+// Cheap per-frame checks run in the browser so only frames worth recognizing
+// are uploaded, and then only as a small crop around the face.
+class FrameGate {
+    constructor(options) {
+        this.options = Object.assign({
+            analysisWidth: 160,      // frames are analysed at this width
+            minBrightness: 40,       // mean luma (0-255) below this is too dark
+            maxBrightness: 220,      // ...and above this is washed out
+            minChange: 4,            // mean absolute luma change since the last upload worth sending again
+            maxIdle: 5000,           // resend an unchanged scene after this many ms anyway
+            maxMotion: 40,           // above this the subject is moving too fast (blurred)
+            minSkinRatio: 0.08,      // fallback face check: skin-tone share of the centre region
+            cropSize: 320,           // uploaded crops are at most cropSize x cropSize
+            cropMargin: 0.4          // padding added around the face box
+        }, options || {});
+        this.analysisCanvas = document.createElement('canvas');
+        this.cropCanvas = document.createElement('canvas');
+        this.previousLuma = null;
+        this.detector = null;
+        if ('FaceDetector' in window) {
+            // Shape Detection API (Chromium); falls back to the skin-tone check elsewhere
+            try {
+                this.detector = new window.FaceDetector({ fastMode: true, maxDetectedFaces: 1 });
+            } catch (err) {
+                this.detector = null;
+            }
+        }
+    }
+
+    // Mean absolute luma difference between two analysis frames (Infinity if not comparable)
+    static difference(a, b) {
+        if (!a || !b || a.length !== b.length) {
+            return Infinity;
+        }
+        let diff = 0;
+        for (let i = 0; i < a.length; i++) {
+            diff += Math.abs(a[i] - b[i]);
+        }
+        return diff / a.length;
+    }
+
+    // Returns { ok, reason, luma, box } for the current video frame
+    async inspect(video) {
+        const width = this.options.analysisWidth;
+        const height = Math.round(width * video.videoHeight / video.videoWidth) || width;
+        this.analysisCanvas.width = width;
+        this.analysisCanvas.height = height;
+        const ctx = this.analysisCanvas.getContext('2d', { willReadFrequently: true });
+        ctx.drawImage(video, 0, 0, width, height);
+        const pixels = ctx.getImageData(0, 0, width, height).data;
+
+        const luma = new Uint8ClampedArray(width * height);
+        let total = 0;
+        for (let i = 0, p = 0; i < luma.length; i++, p += 4) {
+            luma[i] = (pixels[p] * 77 + pixels[p + 1] * 150 + pixels[p + 2] * 29) >> 8;
+            total += luma[i];
+        }
+        const brightness = total / luma.length;
+
+        const motion = FrameGate.difference(luma, this.previousLuma);
+        this.previousLuma = luma;
+
+        if (brightness < this.options.minBrightness) {
+            return { ok: false, reason: 'too dark', luma };
+        }
+        if (brightness > this.options.maxBrightness) {
+            return { ok: false, reason: 'too bright', luma };
+        }
+        if (motion !== Infinity && motion > this.options.maxMotion) {
+            return { ok: false, reason: 'moving', luma };
+        }
+
+        const box = await this.findFace(video, pixels, width, height);
+        if (!box) {
+            return { ok: false, reason: 'no face', luma };
+        }
+        return { ok: true, reason: '', luma, box };
+    }
+
+    // Face box in video pixels, or null
+    async findFace(video, pixels, width, height) {
+        const scale = video.videoWidth / width;
+        if (this.detector) {
+            try {
+                const faces = await this.detector.detect(this.analysisCanvas);
+                if (!faces.length) {
+                    return null;
+                }
+                const b = faces[0].boundingBox;
+                return { x: b.x * scale, y: b.y * scale, width: b.width * scale, height: b.height * scale };
+            } catch (err) {
+                this.detector = null;
+            }
+        }
+        // Heuristic: enough skin-tone pixels (YCbCr range) in the centre of the frame,
+        // where the kiosk asks students to stand
+        const x0 = Math.round(width * 0.25), x1 = Math.round(width * 0.75);
+        const y0 = Math.round(height * 0.15), y1 = Math.round(height * 0.85);
+        let skin = 0;
+        for (let y = y0; y < y1; y++) {
+            for (let x = x0; x < x1; x++) {
+                const p = (y * width + x) * 4;
+                const r = pixels[p], g = pixels[p + 1], b = pixels[p + 2];
+                const cb = 128 - 0.168736 * r - 0.331264 * g + 0.5 * b;
+                const cr = 128 + 0.5 * r - 0.418688 * g - 0.081312 * b;
+                if (cb >= 77 && cb <= 127 && cr >= 133 && cr <= 173) {
+                    skin++;
+                }
+            }
+        }
+        if (skin / ((x1 - x0) * (y1 - y0)) < this.options.minSkinRatio) {
+            return null;
+        }
+        return { x: x0 * scale, y: y0 * scale, width: (x1 - x0) * scale, height: (y1 - y0) * scale };
+    }
+
+    // Square crop around the face, resized to cropSize, as a JPEG blob
+    crop(video, box, quality) {
+        const size = Math.max(box.width, box.height) * (1 + this.options.cropMargin);
+        const side = Math.min(size, video.videoWidth, video.videoHeight);
+        const cx = box.x + box.width / 2;
+        const cy = box.y + box.height / 2;
+        const sx = Math.min(Math.max(cx - side / 2, 0), video.videoWidth - side);
+        const sy = Math.min(Math.max(cy - side / 2, 0), video.videoHeight - side);
+        const out = Math.min(this.options.cropSize, Math.round(side));
+        this.cropCanvas.width = out;
+        this.cropCanvas.height = out;
+        this.cropCanvas.getContext('2d').drawImage(video, sx, sy, side, side, 0, 0, out, out);
+        return new Promise(resolve => this.cropCanvas.toBlob(resolve, 'image/jpeg', quality));
+    }
+}
+
 class AttendanceClient {
     constructor() {
         this.video = document.getElementById('video');
         this.canvas = document.getElementById('canvas');
         this.statusMessage = document.getElementById('statusMessage');
+        const config = document.body.dataset;
+        this.checkInterval = parseInt(config.checkInterval || '250', 10);
+        this.jpegQuality = parseFloat(config.jpegQuality || '0.7');
+        this.gate = new FrameGate({ cropSize: parseInt(config.cropSize || '320', 10) });
+        this.kioskId = this.loadKioskId();
         this.isPaused = false;
-        this.captureInterval = null;
+        this.inFlight = false;
+        this.nextCaptureAt = 0;
+        this.lastSentLuma = null;
+        this.lastSentAt = 0;
+        this.streamUrl = config.streamUrl || '';
+        this.socket = null;
+        this.streamFailures = 0;
+        if (this.streamUrl && 'WebSocket' in window) {
+            this.openStream();
+        }
         this.initCamera();
     }
 
+    // Stable per-device id so the server can keep per-kiosk state behind NAT
+    loadKioskId() {
+        try {
+            let id = localStorage.getItem('kioskId');
+            if (!id) {
+                id = 'kiosk-' + Math.random().toString(36).slice(2, 10);
+                localStorage.setItem('kioskId', id);
+            }
+            return id;
+        } catch (err) {
+            return '';
+        }
+    }
+
     initCamera() {
         navigator.mediaDevices.getUserMedia({ video: true })
             .then(stream => {
@@ -23,11 +183,14 @@ class AttendanceClient {
     }
 
     startAutoCapture() {
-        this.captureInterval = setInterval(() => {
-            if (!this.isPaused) {
-                this.captureAndSend();
+        const tick = async () => {
+            try {
+                await this.checkFrame();
+            } finally {
+                setTimeout(tick, this.checkInterval);
             }
-        }, 5000);
+        };
+        setTimeout(tick, this.checkInterval);
     }
 
     pauseAfterAttendance() {
@@ -39,41 +202,103 @@ class AttendanceClient {
         }, 10000);
     }
 
-    captureAndSend() {
-        this.canvas.width = this.video.videoWidth;
-        this.canvas.height = this.video.videoHeight;
-        this.canvas.getContext('2d').drawImage(this.video, 0, 0);
-        const imageData = this.canvas.toDataURL('image/jpeg');
+    async checkFrame() {
+        if (this.isPaused || this.inFlight || !this.video.videoWidth || Date.now() < this.nextCaptureAt) {
+            return;
+        }
+        const result = await this.gate.inspect(this.video);
+        if (!result.ok) {
+            return;
+        }
+        // Nothing has changed since the last upload: the server would only see the same frame again
+        const change = FrameGate.difference(result.luma, this.lastSentLuma);
+        if (change < this.gate.options.minChange && Date.now() - this.lastSentAt < this.gate.options.maxIdle) {
+            return;
+        }
+        const blob = await this.gate.crop(this.video, result.box, this.jpegQuality);
+        if (blob) {
+            this.lastSentLuma = result.luma;
+            this.lastSentAt = Date.now();
+            this.sendFrame(blob);
+        }
+    }
+
+    // Persistent WebSocket: frames go up as binary messages and results come back
+    // as events; the server drops stale frames if it falls behind
+    openStream() {
+        const url = new URL(this.streamUrl, window.location.href);
+        url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+        if (this.kioskId) {
+            url.searchParams.set('kiosk', this.kioskId);
+        }
+        const socket = new WebSocket(url.toString());
+        let opened = false;
+        socket.onopen = () => { opened = true; };
+        socket.onmessage = event => this.handleResult(JSON.parse(event.data));
+        socket.onclose = event => {
+            // Fall back to HTTP uploads until the stream reconnects; a stream that
+            // never opened or was refused (1013, server at its limit) backs off to 5 minutes
+            this.socket = null;
+            if (opened && event.code !== 1013) {
+                this.streamFailures = 0;
+            } else {
+                this.streamFailures += 1;
+            }
+            setTimeout(() => this.openStream(), Math.min(5000 * 2 ** this.streamFailures, 300000));
+        };
+        this.socket = socket;
+    }
+
+    sendFrame(blob) {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(blob);
+            return;
+        }
+        this.inFlight = true;
         this.statusMessage.textContent = 'Processing...';
         this.statusMessage.className = 'status-message info-message';
-        fetch('/api/recognize_face', {
+        // Raw JPEG body: no base64 inflation and a single decode on the server
+        const headers = { 'Content-Type': 'image/jpeg' };
+        if (this.kioskId) {
+            headers['X-Kiosk-Id'] = this.kioskId;
+        }
+        fetch('/api/recognize_face/frame', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ image: imageData })
+            headers: headers,
+            body: blob
         })
         .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                if (data.student_name && data.student_name.trim() !== "") {
-                    this.statusMessage.textContent = `Attendance marked for: ${data.student_name}`;
-                    this.statusMessage.className = 'status-message success-message';
-                    this.pauseAfterAttendance();
-                } else {
-                    this.statusMessage.textContent = '';
-                    this.statusMessage.className = 'status-message';
-                }
-            } else {
-                this.statusMessage.textContent = data.message || '';
-                this.statusMessage.className = 'status-message error-message';
-            }
-        })
+        .then(data => this.handleResult(data))
         .catch(() => {
             this.statusMessage.textContent = 'Error sending image.';
             this.statusMessage.className = 'status-message error-message';
+        })
+        .finally(() => {
+            this.inFlight = false;
         });
     }
+
+    handleResult(data) {
+        // The server paces uploads: longer while the scene is unchanged or after a mark
+        if (data.next_capture_ms) {
+            this.nextCaptureAt = Date.now() + data.next_capture_ms;
+        }
+        if (data.success) {
+            if (data.student_name && data.student_name.trim() !== "") {
+                this.statusMessage.textContent = `Attendance marked for: ${data.student_name}`;
+                this.statusMessage.className = 'status-message success-message';
+                this.pauseAfterAttendance();
+            } else {
+                this.statusMessage.textContent = '';
+                this.statusMessage.className = 'status-message';
+            }
+        } else {
+            this.statusMessage.textContent = data.message || '';
+            this.statusMessage.className = 'status-message error-message';
+        }
+    }
 }
 
 document.addEventListener('DOMContentLoaded', () => {
     new AttendanceClient();
-});
\ No newline at end of file
+});
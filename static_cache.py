@@ -0,0 +1,93 @@
+import hashlib
+import os
+from flask import request, url_for
+from image_pipeline import derivative_path, is_hashed
+
+# URLs below only change together with the file, so browsers may keep them for a year
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+class StaticCache:
+    """Long-lived browser caching for static files.
+
+    Student photo derivatives carry a content digest in their file name;
+    every other static URL built with ``url_for`` gets a ``?v=<digest>`` of
+    the file, recomputed only when its mtime or size changes. Responses for
+    such URLs are marked immutable for ``STATIC_MAX_AGE``, and Flask's static
+    view keeps answering revalidations with the file's ETag. A URL without a
+    current version falls back to the default revalidated caching.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.max_age = STATIC_MAX_AGE
+        self._versions = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.setdefault('STATIC_CACHE', True)
+        self.max_age = app.config.setdefault('STATIC_MAX_AGE', STATIC_MAX_AGE)
+        app.extensions['static_cache'] = self
+        app.add_template_global(self.photo_url)
+        if self.enabled:
+            app.url_defaults(self._add_version)
+            app.after_request(self._cache_headers)
+
+    def version(self, filename):
+        """Short content hash of a static file, or ``None`` when it does not exist"""
+        path = os.path.join(self.app.static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self._versions.get(filename)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+        version = digest.hexdigest()[:12]
+        self._versions[filename] = ((stat.st_mtime_ns, stat.st_size), version)
+        return version
+
+    def _add_version(self, endpoint, values):
+        if endpoint != 'static' or 'v' in values or is_hashed(values.get('filename')):
+            return
+        version = self.version(values.get('filename', ''))
+        if version:
+            values['v'] = version
+
+    def _cache_headers(self, response):
+        if request.endpoint != 'static' or response.status_code not in (200, 304):
+            return response
+        filename = (request.view_args or {}).get('filename', '')
+        if is_hashed(filename) or (request.args.get('v') and request.args.get('v') == self.version(filename)):
+            response.cache_control.no_cache = None
+            response.cache_control.max_age = self.max_age
+            response.cache_control.immutable = True
+            # Student photos may sit in the browser cache, but not in shared proxies
+            if filename.startswith('photos/'):
+                response.cache_control.private = True
+            else:
+                response.cache_control.public = True
+        return response
+
+    def photo_url(self, photo_path, size='full', fmt='jpg'):
+        """URL of one size of a student photo (``full``, ``card`` or ``thumb``).
+
+        Photos enrolled before derivatives existed only have their original
+        file, which is returned for every size; for ``fmt='webp'`` the result
+        is ``None`` whenever that copy does not exist, so templates can skip
+        the ``<source>``.
+        """
+        if not photo_path:
+            return None
+        path = derivative_path(photo_path, size, fmt)
+        if fmt != 'jpg' and (path == photo_path or not os.path.exists(os.path.join(self.app.static_folder, path))):
+            return None
+        return url_for('static', filename=path)
+
+static_cache = StaticCache()
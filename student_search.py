@@ -0,0 +1,84 @@
+from sqlalchemy import text
+from app import app, db
+from models import Student
+
+PAGE_SIZE = 50
+
+# Trigram FTS5 index over the searchable student columns, kept in sync by
+# triggers. Trigram matching gives the same substring semantics as the old
+# LIKE '%x%' filters without scanning the table.
+FTS_COLUMNS = ['student_id', 'first_name', 'last_name', 'class_name', 'section']
+FTS_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS student_fts USING fts5("
+    f"{', '.join(FTS_COLUMNS)}, content='student', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS student_fts_ai AFTER INSERT ON student BEGIN "
+    f"INSERT INTO student_fts(rowid, {', '.join(FTS_COLUMNS)}) VALUES (new.id, {', '.join('new.' + c for c in FTS_COLUMNS)}); END",
+    f"CREATE TRIGGER IF NOT EXISTS student_fts_ad AFTER DELETE ON student BEGIN "
+    f"INSERT INTO student_fts(student_fts, rowid, {', '.join(FTS_COLUMNS)}) VALUES ('delete', old.id, {', '.join('old.' + c for c in FTS_COLUMNS)}); END",
+    f"CREATE TRIGGER IF NOT EXISTS student_fts_au AFTER UPDATE ON student BEGIN "
+    f"INSERT INTO student_fts(student_fts, rowid, {', '.join(FTS_COLUMNS)}) VALUES ('delete', old.id, {', '.join('old.' + c for c in FTS_COLUMNS)}); "
+    f"INSERT INTO student_fts(rowid, {', '.join(FTS_COLUMNS)}) VALUES (new.id, {', '.join('new.' + c for c in FTS_COLUMNS)}); END",
+]
+
+_fts_available = None
+
+def ensure_search_index():
+    """Create the FTS5 index and its triggers if the database supports them"""
+    global _fts_available
+    if db.engine.dialect.name != 'sqlite':
+        _fts_available = False
+        return False
+    try:
+        with db.engine.begin() as conn:
+            existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'student_fts'")).first() is not None
+            for statement in FTS_SCHEMA:
+                conn.execute(text(statement))
+            if not existed:
+                conn.execute(text("INSERT INTO student_fts(student_fts) VALUES ('rebuild')"))
+        _fts_available = True
+    except Exception as e:
+        app.logger.warning(f"Full-text student search unavailable, using LIKE: {str(e)}")
+        _fts_available = False
+    return _fts_available
+
+def search_index_available():
+    """Whether the FTS5 index exists; looked up once per process (``flask init-db`` creates it)"""
+    global _fts_available
+    if _fts_available is None:
+        try:
+            with db.engine.connect() as conn:
+                _fts_available = db.engine.dialect.name == 'sqlite' and conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = 'student_fts'")).first() is not None
+        except Exception:
+            _fts_available = False
+    return _fts_available
+
+def _fts_query(search):
+    # Every whitespace-separated term must appear somewhere; each is quoted as a literal
+    terms = search.split()
+    if not terms or any(len(term) < 3 for term in terms):
+        return None  # the trigram tokenizer cannot match fewer than 3 characters
+    return ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def search_students(search='', after=None, limit=PAGE_SIZE):
+    """Return one page of students ordered by id, plus the cursor for the next page"""
+    query = Student.query
+    search = (search or '').strip()
+    if search:
+        match = _fts_query(search) if search_index_available() else None
+        if match:
+            matching_ids = text("SELECT rowid FROM student_fts WHERE student_fts MATCH :match").bindparams(match=match)
+            query = query.filter(Student.id.in_(matching_ids))
+        else:
+            for term in search.split():
+                query = query.filter(
+                    (Student.first_name.contains(term)) |
+                    (Student.last_name.contains(term)) |
+                    (Student.student_id.contains(term)) |
+                    (Student.class_name.contains(term))
+                )
+    if after:
+        query = query.filter(Student.id > after)
+    students = query.order_by(Student.id).limit(limit + 1).all()
+    next_cursor = students[limit - 1].id if len(students) > limit else None
+    return students[:limit], next_cursor
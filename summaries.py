@@ -0,0 +1,65 @@
+from collections import Counter
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from models import Student, AttendanceRecord, DailyAttendanceSummary
+
+def summary_deltas(records, sign=1):
+    """Count records per (date, class_name, section) for the rollup table"""
+    student_ids = {record.student_id for record in records}
+    if not student_ids:
+        return Counter()
+    classes = dict(
+        (row.id, (row.class_name, row.section))
+        for row in db.session.query(Student.id, Student.class_name, Student.section).filter(Student.id.in_(student_ids))
+    )
+    deltas = Counter()
+    for record in records:
+        class_name, section = classes.get(record.student_id, ('', ''))
+        deltas[(record.date, class_name, section)] += sign
+    return deltas
+
+def apply_summary_deltas(deltas):
+    """Add the counted deltas to DailyAttendanceSummary in the current transaction"""
+    deltas = {key: n for key, n in deltas.items() if n}
+    if not deltas:
+        return
+    rows = [
+        {'date': day, 'class_name': class_name, 'section': section, 'present_count': n}
+        for (day, class_name, section), n in deltas.items()
+    ]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        # Atomic upsert, so workers flushing concurrently cannot lose increments
+        insert_stmt = (sqlite.insert if dialect == 'sqlite' else postgresql.insert)(DailyAttendanceSummary)
+        stmt = insert_stmt.on_conflict_do_update(
+            index_elements=['date', 'class_name', 'section'],
+            set_={'present_count': DailyAttendanceSummary.present_count + insert_stmt.excluded.present_count},
+        )
+        db.session.execute(stmt, rows)
+        return
+    for row in rows:
+        summary = DailyAttendanceSummary.query.filter_by(
+            date=row['date'], class_name=row['class_name'], section=row['section']
+        ).with_for_update().first()
+        if summary:
+            summary.present_count += row['present_count']
+        else:
+            db.session.add(DailyAttendanceSummary(**row))
+
+def rebuild_summaries():
+    """Recompute the whole rollup table from AttendanceRecord; returns the row count"""
+    db.session.query(DailyAttendanceSummary).delete()
+    grouped = select(
+        AttendanceRecord.date,
+        func.coalesce(Student.class_name, ''),
+        func.coalesce(Student.section, ''),
+        func.count(AttendanceRecord.id),
+    ).join(Student, Student.id == AttendanceRecord.student_id).group_by(
+        AttendanceRecord.date, Student.class_name, Student.section
+    )
+    db.session.execute(insert(DailyAttendanceSummary).from_select(
+        ['date', 'class_name', 'section', 'present_count'], grouped
+    ))
+    db.session.commit()
+    return DailyAttendanceSummary.query.count()
@@ -1,50 +1,60 @@
 import os
 import cv2
 import numpy as np
-import pickle
 from PIL import Image
 from werkzeug.utils import secure_filename
-from app import app
-import uuid
-import random
+from app import app, db
 import base64
+import glob
+import hashlib
+import json
+import time
+from contextlib import nullcontext
+from face_gallery import gallery, compute_face_embedding
+from face_detection import detect_faces
+from image_pipeline import photo_writer, photo_filename, derivative_path
+from id_cards import render_cards, write_sheet
+from metrics import metrics
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+# imdecode flags that let libjpeg skip work by decoding at 1/2, 1/4 or 1/8 size
+DECODE_SCALES = {
+    2: (cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+    4: (cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    8: (cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _store_face_photo(image, student_id):
+    """Embed a decoded photo and queue its resized copies; returns the same dict as the save_* helpers"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    faces = detect_faces(gray)
+    if len(faces) == 0:
+        return {'success': False, 'message': 'No face detected in the image. Please upload a clear photo with a visible face.'}
+    if len(faces) > 1:
+        return {'success': False, 'message': 'Multiple faces detected. Please upload a photo with only one face.'}
+    embedding = compute_face_embedding(gray, faces[0])
+    if embedding is None:
+        return {'success': False, 'message': 'Could not extract face features. Please upload a clearer photo.'}
+    gallery.add(student_id, embedding)
+    # The registration is complete once the embedding is stored; resizing and
+    # re-encoding the photo happens on the photo writer pool.
+    filename = photo_filename(f"student_{student_id}", image)
+    photo_dir = os.path.join('static', 'photos')
+    os.makedirs(photo_dir, exist_ok=True)
+    photo_writer.submit(image, os.path.join(photo_dir, filename))
+    return {'success': True, 'encoding_path': gallery.store.vectors_path, 'photo_path': f"photos/{filename}", 'message': 'Face data saved successfully'}
+
+@metrics.timed('save_face_encoding')
 def save_face_encoding(file, student_id):
     try:
-        filename = secure_filename(file.filename)
-        file_extension = filename.rsplit('.', 1)[1].lower()
-        photo_filename = f"student_{student_id}.{file_extension}"
-        photo_dir = os.path.join('static', 'photos')
-        os.makedirs(photo_dir, exist_ok=True)
-        photo_path = os.path.join(photo_dir, photo_filename)
-        file.save(photo_path)
-        image = cv2.imread(photo_path)
+        image = decode_image_bytes(file.read())
         if image is None:
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
             return {'success': False, 'message': 'Invalid image file. Please upload a valid image.'}
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = [(100, 100, 200, 200)]
-        if len(faces) == 0:
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
-            return {'success': False, 'message': 'No face detected in the image. Please upload a clear photo with a visible face.'}
-        if len(faces) > 1:
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
-            return {'success': False, 'message': 'Multiple faces detected. Please upload a photo with only one face.'}
-        face_data = {'face_region': list(faces[0]), 'image_hash': hash(image.tobytes()), 'image_shape': image.shape}
-        encoding_filename = f"encoding_{student_id}.pkl"
-        encoding_path = os.path.join('static/face_encodings', encoding_filename)
-        with open(encoding_path, 'wb') as f:
-            pickle.dump(face_data, f)
-        optimize_image(photo_path)
-        return {'success': True, 'encoding_path': encoding_path, 'photo_path': f"photos/{photo_filename}", 'message': 'Face data saved successfully'}
+        return _store_face_photo(image, student_id)
     except Exception as e:
         app.logger.error(f"Error saving face encoding: {str(e)}")
         return {'success': False, 'message': f'Error processing image: {str(e)}'}
@@ -66,108 +76,107 @@ def optimize_image(image_path, max_size=(400, 400), quality=85):
     except Exception as e:
         app.logger.error(f"Error optimizing image: {str(e)}")
 
-def recognize_face(image, confidence_threshold=0.6):
-    """Recognize face in the given image (simplified version)"""
+def decode_image_bytes(image_bytes, scale=1, grayscale=False):
+    """Decode an encoded image straight from memory, optionally at reduced size"""
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    if scale in DECODE_SCALES:
+        flag = DECODE_SCALES[scale][1 if grayscale else 0]
+    else:
+        flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    return cv2.imdecode(buffer, flag)
+
+def recognize_face(image, confidence_threshold=0.6, top_k=3, tracker=None, min_face_size=None, timer=None):
+    """Recognize the largest face in a BGR or grayscale image against the in-memory gallery.
+
+    ``timer`` (a recognition_pool.StageTimer) receives detect/embed/match timings.
+    """
+    stage = timer.stage if timer is not None else (lambda name: nullcontext())
     try:
         # Convert to grayscale for face detection
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        with stage('convert'):
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
-        # Simulate face detection for now
-        faces = [(100, 100, 200, 200)]  # Simulate detected face
+        detect_kwargs = {'min_size': min_face_size} if min_face_size else {}
+        with stage('detect'):
+            faces = tracker.detect(gray, **detect_kwargs) if tracker else detect_faces(gray, **detect_kwargs)
         
         if len(faces) == 0:
             return {'success': False, 'message': 'No face detected'}
         
-        # For now, simulate face recognition by randomly matching with registered students
-        # In a real implementation, this would use proper face recognition algorithms
-        encoding_dir = 'static/face_encodings'
-        known_student_ids = []
+        if len(gallery) == 0:
+            return {'success': False, 'message': 'No registered faces found'}
         
-        if os.path.exists(encoding_dir):
-            for filename in os.listdir(encoding_dir):
-                if filename.endswith('.pkl'):
-                    try:
-                        student_id = int(filename.split('_')[1].split('.')[0])
-                        known_student_ids.append(student_id)
-                    except Exception as e:
-                        app.logger.error(f"Error loading encoding {filename}: {str(e)}")
-                        continue
+        with stage('embed'):
+            embedding = compute_face_embedding(gray, faces[0])
+        if embedding is None:
+            return {'success': False, 'message': 'No face detected'}
         
-        if not known_student_ids:
+        with stage('match'):
+            candidates = gallery.match(embedding, top_k=top_k)
+        if not candidates:
             return {'success': False, 'message': 'No registered faces found'}
-        
-        # Simplified matching - in a real system this would do actual face comparison
-        # For demonstration, we'll use a probability-based system
-        if random.random() > 0.3:  # 70% chance of "recognizing" a face for demo
-            matched_student_id = random.choice(known_student_ids)
-            confidence = round(random.uniform(0.7, 0.95), 3)  # Random confidence between 70-95%
-            
+        best = candidates[0]
+        if best['confidence'] >= confidence_threshold:
             return {
                 'success': True,
-                'student_id': matched_student_id,
-                'confidence': confidence,
-                'message': 'Face recognized successfully (demo mode)'
+                'student_id': best['student_id'],
+                'confidence': best['confidence'],
+                'candidates': candidates,
+                'message': 'Face recognized successfully'
             }
         
-        return {'success': False, 'message': 'Face not recognized with sufficient confidence'}
+        return {'success': False, 'candidates': candidates, 'message': 'Face not recognized with sufficient confidence'}
         
     except Exception as e:
         app.logger.error(f"Error in face recognition: {str(e)}")
         return {'success': False, 'message': 'Recognition failed due to technical error'}
 
+def recognize_faces(images, confidence_threshold=0.6, max_dim=1280, min_face_size=(30, 30)):
+    """Recognize every face across one or more BGR/grayscale images.
+
+    All detected faces are matched against the gallery in one batch. Returns a
+    list of per-face dicts carrying the source ``frame`` index and ``box``;
+    when a student appears more than once only the most confident face keeps
+    ``success``.
+    """
+    faces, embeddings = [], []
+    for frame_index, image in enumerate(images):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        for box in detect_faces(gray, max_dim=max_dim, min_size=min_face_size):
+            embedding = compute_face_embedding(gray, box)
+            if embedding is not None:
+                faces.append({'frame': frame_index, 'box': [int(v) for v in box]})
+                embeddings.append(embedding)
+    best_by_student = {}
+    for face, candidates in zip(faces, gallery.match_many(embeddings, top_k=1)):
+        best = candidates[0] if candidates else None
+        face['success'] = bool(best and best['confidence'] >= confidence_threshold)
+        if not face['success']:
+            continue
+        face['student_id'] = best['student_id']
+        face['confidence'] = best['confidence']
+        previous = best_by_student.get(best['student_id'])
+        if previous is None or previous['confidence'] < face['confidence']:
+            if previous is not None:
+                previous['success'], previous['duplicate'] = False, True
+            best_by_student[best['student_id']] = face
+        else:
+            face['success'], face['duplicate'] = False, True
+    return faces
+
+@metrics.timed('save_face_encoding_from_data')
 def save_face_encoding_from_data(image_data, student_id):
     """Save face encoding from base64 image data"""
     try:
         # Remove data URL prefix
         header, image_b64 = image_data.split(',', 1)
-        image_bytes = base64.b64decode(image_b64)
-        photo_filename = f"student_{student_id}.jpg"
-        photo_dir = os.path.join('static', 'photos')
-        os.makedirs(photo_dir, exist_ok=True)
-        photo_path = os.path.join(photo_dir, photo_filename)
-        with open(photo_path, 'wb') as f:
-            f.write(image_bytes)
-        image = cv2.imread(photo_path)
+        image = decode_image_bytes(base64.b64decode(image_b64))
         if image is None:
             return {
                 'success': False,
                 'message': 'Invalid image data.'
             }
-        # Actual face detection using Haar Cascade
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        face_cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        face_cascade = cv2.CascadeClassifier(face_cascade_path)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(80, 80))
-        if len(faces) == 0:
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
-            return {
-                'success': False,
-                'message': 'No face detected in the image. Please upload a clear photo with a visible face.'
-            }
-        if len(faces) > 1:
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
-            return {
-                'success': False,
-                'message': 'Multiple faces detected. Please upload a photo with only one face.'
-            }
-        face_data = {
-            'face_region': list(faces[0]),
-            'image_hash': hash(image.tobytes()),
-            'image_shape': image.shape
-        }
-        encoding_filename = f"encoding_{student_id}.pkl"
-        encoding_path = os.path.join('static/face_encodings', encoding_filename)
-        with open(encoding_path, 'wb') as f:
-            pickle.dump(face_data, f)
-        optimize_image(photo_path)
-        return {
-            'success': True,
-            'encoding_path': encoding_path,
-            'photo_path': f"photos/{photo_filename}",
-            'message': 'Face data saved successfully'
-        }
+        return _store_face_photo(image, student_id)
     except Exception as e:
         app.logger.error(f"Error saving face encoding: {str(e)}")
         return {
@@ -175,44 +184,67 @@ def save_face_encoding_from_data(image_data, student_id):
             'message': f'Error processing image: {str(e)}'
         }
 
-def search_student_by_image(image_data):
-    """Search for student by face image data"""
+SEARCH_MATCH_CONFIDENCE = 0.7
+
+@metrics.timed('search_student_by_image')
+def search_student_by_image(image_data, top_k=5, class_name=None, section=None, min_confidence=0.5):
+    """Rank enrolled students against a face image, optionally within one class/section.
+
+    ``student`` is the best candidate when it clears SEARCH_MATCH_CONFIDENCE;
+    ``candidates`` lists up to ``top_k`` active students above ``min_confidence``.
+    """
     try:
         from models import Student
         
         # Remove data URL prefix
         header, image_b64 = image_data.split(',', 1)
-        image_bytes = base64.b64decode(image_b64)
-        
-        # Create temporary file for processing
-        temp_path = os.path.join('/tmp', f'search_{uuid.uuid4().hex}.jpg')
-        with open(temp_path, 'wb') as f:
-            f.write(image_bytes)
-        
-        # For simplified matching, compare with all students
-        students = Student.query.filter_by(is_active=True).all()
-        
-        for student in students:
-            if student.face_encoding_path and os.path.exists(student.face_encoding_path):
-                # Simple match simulation - in a real implementation, 
-                # this would compare face encodings
-                confidence = random.uniform(0.6, 0.9)
-                if confidence > 0.7:  # Threshold for match
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                    return {
-                        'success': True,
-                        'student': student,
-                        'confidence': confidence
-                    }
-        
-        # Clean up
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        image = decode_image_bytes(base64.b64decode(image_b64), grayscale=True)
+        if image is None:
+            return {
+                'success': False,
+                'message': 'Invalid image data.'
+            }
+        faces = detect_faces(image)
+        embedding = compute_face_embedding(image, faces[0]) if len(faces) else None
+        if embedding is None:
+            return {
+                'success': False,
+                'message': 'No face detected in the image.'
+            }
         
+        allowed = None
+        if class_name or section:
+            # Narrow the gallery to the requested roster before scoring
+            query = db.session.query(Student.id).filter(Student.is_active == True)
+            if class_name:
+                query = query.filter(Student.class_name == class_name)
+            if section:
+                query = query.filter(Student.section == section)
+            allowed = [row.id for row in query]
+            if not allowed:
+                return {
+                    'success': False,
+                    'message': 'No active students in that class/section.'
+                }
+        # Over-fetch a little so inactive students dropped below still leave top_k
+        matches = [m for m in gallery.match(embedding, top_k=top_k * 2, candidates=allowed) if m['confidence'] >= min_confidence]
+        students = {student.id: student for student in Student.query.filter(Student.id.in_([m['student_id'] for m in matches]))}
+        candidates = [
+            {'student': students[m['student_id']], 'similarity': round(m['similarity'], 4), 'confidence': m['confidence']}
+            for m in matches
+            if m['student_id'] in students and students[m['student_id']].is_active
+        ][:top_k]
+        if not candidates:
+            return {
+                'success': False,
+                'message': 'No matching student found in database.'
+            }
+        best = candidates[0]
         return {
-            'success': False,
-            'message': 'No matching student found in database.'
+            'success': True,
+            'student': best['student'] if best['confidence'] > SEARCH_MATCH_CONFIDENCE else None,
+            'confidence': best['confidence'],
+            'candidates': candidates
         }
         
     except Exception as e:
@@ -229,5 +261,65 @@ def generate_id_card(student):
         'name': student.full_name,
         'class_name': student.class_name,
         'section': student.section,
+        'address': student.address,
         'photo_path': student.photo_path
-    }
\ No newline at end of file
+    }
+
+def id_card_settings():
+    return {
+        'school_name': app.config['ID_CARD_SCHOOL_NAME'],
+        'school_address': app.config['ID_CARD_SCHOOL_ADDRESS'],
+        'validity': app.config['ID_CARD_VALIDITY'],
+    }
+
+def render_id_cards(students, workers=None):
+    """Render the ID cards of ``students`` that are not cached yet; returns ``(card_paths, rendered_count)``.
+
+    Cards are cached under ``ID_CARD_CACHE_DIR`` keyed by their printed
+    fields and photo, so only new or changed students are drawn.
+    """
+    cards = []
+    for student in students:
+        fields = generate_id_card(student)
+        photo_path = fields.pop('photo_path')
+        cards.append((student.id, fields, os.path.join('static', derivative_path(photo_path, 'card')) if photo_path else None))
+    return render_cards(cards, app.config['ID_CARD_CACHE_DIR'], id_card_settings(),
+                        workers=workers or app.config['ID_CARD_WORKERS'])
+
+# Seconds a superseded print sheet is kept for downloads that already resolved its path
+STALE_SHEET_GRACE = 300
+
+def id_card_sheet(class_name='', section='', fmt='pdf', workers=None):
+    """Print sheet (multi-page PDF or PNG montage) for the active students of a class/section; blank matches all.
+
+    Returns ``(sheet_path, download_name, card_count, rendered_count)``, or
+    ``None`` when no student matches.
+    """
+    from models import Student
+    query = Student.query.filter(Student.is_active == True)
+    if class_name:
+        query = query.filter(Student.class_name == class_name)
+    if section:
+        query = query.filter(Student.section == section)
+    students = query.order_by(Student.student_id).all()
+    if not students:
+        return None
+    paths, rendered = render_id_cards(students, workers=workers)
+    cache_dir = app.config['ID_CARD_CACHE_DIR']
+    # One file per filter, named by a hash of it so no two filters can share or evict each other's sheet
+    filter_key = hashlib.sha256(json.dumps([class_name, section, fmt]).encode()).hexdigest()[:16]
+    cards_key = hashlib.sha256('\n'.join(paths).encode()).hexdigest()[:20]
+    sheet_path = os.path.join(cache_dir, f"sheet_{filter_key}_{cards_key}.{fmt}")
+    if not os.path.exists(sheet_path):
+        # Staged and renamed into place, so concurrent requests never see a partial sheet
+        write_sheet(paths, sheet_path, fmt)
+        # Older sheets for this filter may still be on their way to a browser; only clear ones past the grace period
+        cutoff = time.time() - STALE_SHEET_GRACE
+        for stale in glob.glob(os.path.join(cache_dir, f"sheet_{filter_key}_*.{fmt}")):
+            try:
+                if stale != sheet_path and os.path.getmtime(stale) < cutoff:
+                    os.remove(stale)
+            except FileNotFoundError:
+                pass  # another request cleared it first
+    label = f"class_{secure_filename(class_name) or 'all'}_section_{secure_filename(section) or 'all'}"
+    return sheet_path, f"id_cards_{label}.{fmt}", len(students), rendered
@@ -0,0 +1,20 @@
+import multiprocessing
+
+# Imported once by the forkserver, so every pool worker starts with them loaded
+WORKER_MODULES = ['enrollment', 'id_cards']
+
+def pool_context():
+    """Start method for process pools created inside the running app.
+
+    Forking the app would copy locks held by its background threads (photo
+    writer, attendance writer, recognition pool) into the child. The
+    forkserver forks from a clean process that has only imported
+    ``WORKER_MODULES``. As with ``spawn``, each worker still imports the
+    ``__main__`` script, so scripts that start imports need a
+    ``if __name__ == '__main__':`` guard.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(WORKER_MODULES)
+    return context
@@ -0,0 +1,9 @@
+"""
+WSGI entry point with the fully assembled application.
+
+``flask`` looks for ``wsgi.py`` before ``app.py``, so plain ``flask init-db``
+and ``flask db upgrade`` run from this directory find every command here;
+``app.py`` alone only holds the unassembled ``app``. Serve it with
+``gunicorn wsgi:app``.
+"""
+from main import app